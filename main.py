@@ -1,21 +1,33 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import os
+import time
+import uuid
 import asyncio
 import httpx
 import uvicorn
 from celery.signals import worker_process_init
 
-from src.dependencies import get_celery_app, redis_client
+from src.dependencies import get_celery_app
 from src.config import settings
 from src.utils import *
 from src.tasks import *
 from src.schemas import *
 from src.s3_client import S3Client
 from src.test_generator import generate_data
-from src.system_info import get_system_info
+import src.node_info as node_info
+from src.http_clients import open_async_clients, close_async_clients
+from src.analyzer_client import analyze_async
+from src.compile_cache import get_stats as get_compile_cache_stats
+from src.output_stream import output_events
+import src.benchmark_history as benchmark_history
+import src.warm_launcher as warm_launcher
+import src.build_profiles as build_profiles
+import src.artifact_store as artifact_store
+import src.metrics as metrics
+import src.batch as batch
 
 router = APIRouter()
 
@@ -30,18 +42,21 @@ def configure_flower(sender=None, conf=None, **kwargs):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    cleaner_task = asyncio.create_task(clean_old_files("/tmp", ".cpp", 60))
     checker_task = asyncio.create_task(check_unacknowledged_tasks())
+    system_info_task = asyncio.create_task(node_info.refresh_system_info())
     dir_path = os.path.join(os.getcwd(), ".data")
     if not os.path.exists(dir_path):
         os.makedirs(dir_path)
+    open_async_clients()
+    metrics.init_tracing("server_compiler-api")
     yield
-    cleaner_task.cancel()
-    checker_task.cancel()
-    try:
-        await asyncio.gather(cleaner_task, checker_task)
-    except asyncio.CancelledError:
-        pass
+    for background_task in (checker_task, system_info_task):
+        background_task.cancel()
+        try:
+            await background_task
+        except asyncio.CancelledError:
+            pass
+    await close_async_clients()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -55,68 +70,119 @@ app.add_middleware(
 
 s3_client = S3Client()
 
+@app.get('/metrics')
+def get_metrics():
+    content, media_type = metrics.render()
+    return Response(content, media_type=media_type)
+
 @app.get('/system')
 async def get_processor_info():
-    return get_system_info()
+    return await node_info.get_info()
 
 @app.post('/functions')
 async def get_function_declarations(request: CompileRequest):
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                settings.input_analyzer_url,
-                json={"type": "funcs", "content": request.code}
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            return {"error": str(e)}
+    try:
+        return await analyze_async("funcs", request.code)
+    except httpx.HTTPError as e:
+        return {"error": str(e)}
 
 @app.post('/compile')
 async def compile_code(request: CompileRequest):
-    task = compile_task.delay(request.code, request.user_id)
+    build_profiles.get_flags(request.profile)
+    task = compile_task.delay(request.code, request.user_id, request.course_id, request.profile, request.harness)
     return {"task_id": task.id}
 
+@app.get('/cache/compile/stats')
+def compile_cache_stats(course_id: str = None):
+    return get_compile_cache_stats(course_id)
+
+@app.get('/launcher/stats')
+def launcher_stats():
+    return warm_launcher.get_stats()
+
+@app.get('/artifacts/stats')
+def artifacts_stats(user_id: str = None):
+    return artifact_store.get_stats(user_id)
+
+@app.get('/history/trends')
+def history_trends(function: str = None, machine: str = None, thread: int = None, limit: int = 500,
+                   user_id: str = None, code_hash: str = None):
+    return benchmark_history.trend(function, machine, thread, limit, user_id, code_hash)
+
+@app.get('/history/regressions')
+def history_regressions(function: str = None, machine: str = None, user_id: str = None, code_hash: str = None):
+    return benchmark_history.detect_regressions(function, machine, user_id, code_hash)
+
 @app.post('/execute/{file_id}')
 async def execute_code(file_id: str, request: ExecuteRequest):
-    task = execute_task.delay(file_id, request.user_id, request.input_data)
+    task = execute_task.delay(file_id, request.user_id, request.input_data, request.stream)
     return {"task_id": task.id}
 
+@app.get('/execute/{task_id}/stream')
+async def stream_output(task_id: str, last_event_id: str = Header("0")):
+    return StreamingResponse(
+        output_events(task_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post('/test/{file_id}')
 async def execute_test(file_id: str, request: ExecuteRequest):
-    task = execute_test_task.delay(file_id, request.user_id, request.input_data)
+    build_profiles.validate(request.profiles)
+    task = execute_test_task.delay(
+        file_id, request.user_id, request.input_data, request.profiles, request.counters
+    )
     return {"task_id": task.id}
 
+@app.post('/batch')
+def create_batch(request: BatchRequest):
+    if len(request.submissions) > settings.batch_max_submissions:
+        raise HTTPException(400, f"Слишком много решений в пакете: максимум {settings.batch_max_submissions}")
+    if len({submission.id for submission in request.submissions}) != len(request.submissions):
+        raise HTTPException(400, "Идентификаторы решений в пакете должны быть уникальными")
+    build_profiles.get_flags(request.profile)
+    generate_data(request.data)
+    batch_id = str(uuid.uuid4())
+    submissions = [submission.model_dump() for submission in request.submissions]
+    batch.create(batch_id, request.user_id, submissions)
+    task = batch_task.delay(
+        batch_id, request.user_id, request.data.model_dump(), submissions, request.profile, request.counters
+    )
+    return {"batch_id": batch_id, "task_id": task.id, "total": len(submissions)}
+
+@app.get('/batch/{batch_id}')
+def get_batch(batch_id: str, sort: str = "id", desc: bool = False):
+    return batch.report(batch_id, sort, desc)
+
 @app.post('/cancel/{file_id}')
 async def cancel_process(file_id: str):
     task = cancel_task.delay(file_id)
     return {"task_id": task.id}
 
 @app.post('/generate')
-async def test_generate(data: TestDataRequest):
+def test_generate(data: TestDataRequest):
     return generate_data(data)
 
 @app.get("/task/{task_id}/status")
 async def get_task_status(task_id: str, ack: bool = True):
-    task_result = app_celery.AsyncResult(task_id)
-    
-    if task_result.state == 'SUCCESS':
-        if ack:
-            redis_client.delete(f"pending_ack:{task_id}")
-        needs_ack = redis_client.exists(f"pending_ack:{task_id}")
-        return {
-            "status": "SUCCESS",
-            "result": task_result.result,
-            "requires_acknowledgment": bool(needs_ack) if not ack else False
-        }
-    
-    return {"status": task_result.state}
+    meta = await get_task_meta(task_id)
+    return await task_status_payload(task_id, meta, ack)
+
+@app.get("/task/{task_id}/events")
+async def task_events(task_id: str, ack: bool = True):
+    return StreamingResponse(
+        task_result_events(task_id, ack),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/task/{task_id}/acknowledge")
 async def acknowledge_result(task_id: str, user_id: str):
-    redis_client.delete(f"pending_ack:{task_id}")
+    await acknowledge_task(task_id)
     return {"status": "acknowledged"}
 
+app.include_router(router)
+
 @app.middleware("http")
 async def timeout_middleware(request, call_next):
     try:
@@ -127,5 +193,22 @@ async def timeout_middleware(request, call_next):
             status_code=504
         )
 
+@app.middleware("http")
+async def metrics_middleware(request, call_next):
+    started = time.perf_counter()
+    status = 500
+    with metrics.span(f"HTTP {request.method} {request.url.path}", method=request.method, path=request.url.path):
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            metrics.HTTP_SECONDS.labels(
+                request.method,
+                route.path if route else "unmatched",
+                str(status)
+            ).observe(time.perf_counter() - started)
+
 if __name__ == '__main__':
     uvicorn.run("main:app", host='0.0.0.0', port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,67 @@
+import time
+import json
+import hashlib
+from src.config import settings
+from src.dependencies import redis_client, async_redis_client
+from src.http_clients import get_sync_client, get_async_client
+
+ANALYZER_CACHE_INDEX = "analyzer_cache:index"
+
+def _cache_key(type: str, code: str):
+    return f"analyzer_cache:{type}:{hashlib.sha256(code.encode()).hexdigest()}"
+
+def _queue_store(pipe, key: str, content: bytes):
+    pipe.set(key, content, ex=settings.analyzer_cache_ttl)
+    pipe.zadd(ANALYZER_CACHE_INDEX, {key: time.time()})
+    pipe.zcard(ANALYZER_CACHE_INDEX)
+
+def _excess(size: int):
+    return max(size - settings.analyzer_cache_max_entries, 0)
+
+def analyze(type: str, code: str):
+    key = _cache_key(type, code)
+    cached = redis_client.get(key)
+    if cached is not None:
+        redis_client.zadd(ANALYZER_CACHE_INDEX, {key: time.time()})
+        return json.loads(cached)
+
+    client = get_sync_client(settings.input_analyzer_url)
+    response = client.post(
+        settings.input_analyzer_url,
+        json={"type": type, "content": code}
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    if len(response.content) <= settings.analyzer_cache_max_value_bytes:
+        pipe = redis_client.pipeline()
+        _queue_store(pipe, key, response.content)
+        excess = _excess(pipe.execute()[-1])
+        if excess:
+            evicted = redis_client.zpopmin(ANALYZER_CACHE_INDEX, excess)
+            redis_client.delete(*(member for member, _ in evicted))
+    return data
+
+async def analyze_async(type: str, code: str):
+    key = _cache_key(type, code)
+    cached = await async_redis_client.get(key)
+    if cached is not None:
+        await async_redis_client.zadd(ANALYZER_CACHE_INDEX, {key: time.time()})
+        return json.loads(cached)
+
+    client = get_async_client(settings.input_analyzer_url)
+    response = await client.post(
+        settings.input_analyzer_url,
+        json={"type": type, "content": code}
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    if len(response.content) <= settings.analyzer_cache_max_value_bytes:
+        pipe = async_redis_client.pipeline()
+        _queue_store(pipe, key, response.content)
+        excess = _excess((await pipe.execute())[-1])
+        if excess:
+            evicted = await async_redis_client.zpopmin(ANALYZER_CACHE_INDEX, excess)
+            await async_redis_client.delete(*(member for member, _ in evicted))
+    return data
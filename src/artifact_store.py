@@ -0,0 +1,214 @@
+import os
+import time
+import shutil
+import socket
+from src.config import settings
+from src.dependencies import redis_client
+
+NODES_KEY = "artifacts:nodes"
+NODE = socket.gethostname()
+
+ALLOWED_ROOTS = (
+    os.path.join(os.getcwd(), ".data") + os.sep,
+    "/tmp" + os.sep,
+)
+
+def _key(name: str, node: str = None):
+    return f"artifacts:{node or NODE}:{name}"
+
+USERS_KEY = _key("users")
+GLOBAL_INDEX = _key("index")
+SIZES_KEY = _key("sizes")
+OWNERS_KEY = _key("owners")
+GLOBAL_BYTES = _key("bytes")
+TMP_INDEX = _key("tmp")
+STATS_KEY = _key("stats")
+
+def _user_index(user_id: str, node: str = None):
+    return _key(f"index:{user_id}", node)
+
+def _user_bytes(user_id: str, node: str = None):
+    return _key(f"bytes:{user_id}", node)
+
+def node_queue(node: str = None, queue: str = None):
+    name = f"node.{node or NODE}"
+    return f"{name}.{queue}" if queue else name
+
+def running_key(file_id: str):
+    return f"engine:running:{file_id}"
+
+def _in_use(path: str):
+    file_id = os.path.basename(path.rstrip(os.sep)).split(".")[0]
+    return bool(file_id) and bool(redis_client.exists(running_key(file_id)))
+
+def _size(path: str):
+    if os.path.isdir(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for filename in files:
+                try:
+                    total += os.lstat(os.path.join(root, filename)).st_size
+                except OSError:
+                    pass
+        return total
+    try:
+        return os.lstat(path).st_size
+    except OSError:
+        return 0
+
+def register(user_id: str, path: str):
+    path = os.path.abspath(path)
+    user_id = str(user_id)
+    size = _size(path)
+    previous = redis_client.hget(SIZES_KEY, path)
+    delta = size - (int(previous) if previous else 0)
+    now = time.time()
+    pipe = redis_client.pipeline()
+    pipe.sadd(NODES_KEY, NODE)
+    pipe.sadd(USERS_KEY, user_id)
+    pipe.zadd(_user_index(user_id), {path: now})
+    pipe.zadd(GLOBAL_INDEX, {path: now})
+    pipe.hset(SIZES_KEY, path, size)
+    pipe.hset(OWNERS_KEY, path, user_id)
+    pipe.incrby(_user_bytes(user_id), delta)
+    pipe.incrby(GLOBAL_BYTES, delta)
+    pipe.execute()
+
+def touch(user_id: str, path: str):
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        return False
+    os.utime(path)
+    now = time.time()
+    pipe = redis_client.pipeline()
+    pipe.zadd(_user_index(str(user_id)), {path: now}, xx=True)
+    pipe.zadd(GLOBAL_INDEX, {path: now}, xx=True)
+    pipe.execute()
+    return True
+
+def register_tmp(path: str):
+    pipe = redis_client.pipeline()
+    pipe.sadd(NODES_KEY, NODE)
+    pipe.zadd(TMP_INDEX, {os.path.abspath(path): time.time()})
+    pipe.execute()
+
+def release_tmp(path: str):
+    redis_client.zrem(TMP_INDEX, os.path.abspath(path))
+
+def _delete(path: str):
+    if not path.startswith(ALLOWED_ROOTS):
+        return False
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        return False
+    return True
+
+def _evict(path: str):
+    owner = redis_client.hget(OWNERS_KEY, path)
+    size = redis_client.hget(SIZES_KEY, path)
+    size = int(size) if size else 0
+    deleted = _delete(path)
+    pipe = redis_client.pipeline()
+    if owner:
+        user_id = owner.decode()
+        pipe.zrem(_user_index(user_id), path)
+        pipe.decrby(_user_bytes(user_id), size)
+    pipe.zrem(GLOBAL_INDEX, path)
+    pipe.hdel(SIZES_KEY, path)
+    pipe.hdel(OWNERS_KEY, path)
+    pipe.decrby(GLOBAL_BYTES, size)
+    pipe.execute()
+    return size if deleted else 0
+
+def remove(path: str):
+    return _evict(os.path.abspath(path))
+
+def _evict_oldest(index: str, bytes_key: str, quota: int, reclaimed: dict):
+    offset = 0
+    while int(redis_client.get(bytes_key) or 0) > quota:
+        oldest = redis_client.zrange(index, offset, offset + settings.artifact_gc_batch - 1)
+        if not oldest:
+            break
+        for member in oldest:
+            path = member.decode()
+            if _in_use(path):
+                offset += 1
+                continue
+            reclaimed["bytes"] += _evict(path)
+            reclaimed["files"] += 1
+            if int(redis_client.get(bytes_key) or 0) <= quota:
+                break
+
+def collect_garbage():
+    reclaimed = {"bytes": 0, "files": 0, "tmp_files": 0, "skipped": 0}
+    now = time.time()
+
+    for member in redis_client.zrangebyscore(TMP_INDEX, "-inf", now - settings.tmp_source_max_age):
+        path = member.decode()
+        if _delete(path):
+            reclaimed["tmp_files"] += 1
+        redis_client.zrem(TMP_INDEX, path)
+
+    for member in redis_client.zrangebyscore(GLOBAL_INDEX, "-inf", now - settings.artifact_max_age):
+        path = member.decode()
+        if _in_use(path):
+            reclaimed["skipped"] += 1
+            continue
+        reclaimed["bytes"] += _evict(path)
+        reclaimed["files"] += 1
+
+    for user in redis_client.smembers(USERS_KEY):
+        user_id = user.decode()
+        _evict_oldest(_user_index(user_id), _user_bytes(user_id), settings.artifact_user_quota_bytes, reclaimed)
+        if not redis_client.zcard(_user_index(user_id)):
+            redis_client.srem(USERS_KEY, user_id)
+
+    _evict_oldest(GLOBAL_INDEX, GLOBAL_BYTES, settings.artifact_global_quota_bytes, reclaimed)
+
+    pipe = redis_client.pipeline()
+    pipe.hincrby(STATS_KEY, "runs", 1)
+    pipe.hincrby(STATS_KEY, "reclaimed_bytes", reclaimed["bytes"])
+    pipe.hincrby(STATS_KEY, "removed_artifacts", reclaimed["files"])
+    pipe.hincrby(STATS_KEY, "removed_tmp_files", reclaimed["tmp_files"])
+    pipe.hset(STATS_KEY, "last_run", now)
+    pipe.execute()
+    return reclaimed
+
+def nodes():
+    return sorted(member.decode() for member in redis_client.smembers(NODES_KEY))
+
+def _node_stats(node: str, user_id: str = None):
+    counters = {key.decode(): value.decode() for key, value in redis_client.hgetall(_key("stats", node)).items()}
+    stats = {
+        "node": node,
+        "used_bytes": int(redis_client.get(_key("bytes", node)) or 0),
+        "quota_bytes": settings.artifact_global_quota_bytes,
+        "artifacts": redis_client.zcard(_key("index", node)),
+        "gc_runs": int(counters.get("runs", 0)),
+        "reclaimed_bytes": int(counters.get("reclaimed_bytes", 0)),
+        "removed_artifacts": int(counters.get("removed_artifacts", 0)),
+        "removed_tmp_files": int(counters.get("removed_tmp_files", 0)),
+        "last_run": float(counters["last_run"]) if "last_run" in counters else None
+    }
+    if user_id is not None:
+        stats["user"] = {
+            "user_id": user_id,
+            "used_bytes": int(redis_client.get(_user_bytes(user_id, node)) or 0),
+            "quota_bytes": settings.artifact_user_quota_bytes,
+            "artifacts": redis_client.zcard(_user_index(user_id, node))
+        }
+    return stats
+
+def get_stats(user_id: str = None):
+    node_stats = [_node_stats(node, user_id) for node in nodes()]
+    return {
+        "used_bytes": sum(stats["used_bytes"] for stats in node_stats),
+        "artifacts": sum(stats["artifacts"] for stats in node_stats),
+        "nodes": node_stats
+    }
@@ -0,0 +1,150 @@
+import json
+import time
+import hashlib
+from fastapi import HTTPException
+from src.config import settings
+from src.dependencies import redis_client
+from src.schemas import TestDataRequest
+from src.test_generator import generate_data
+import src.build_profiles as build_profiles
+
+SORT_FIELDS = ("id", "status", "speedup", "best_time", "sequential_time")
+FINAL_STATUSES = ("compile_error", "tested", "failed")
+
+def _key(batch_id: str):
+    return f"batch:{batch_id}"
+
+def _submissions_key(batch_id: str):
+    return f"batch:{batch_id}:submissions"
+
+def run_dir(user_id: str, batch_id: str, file_id: str):
+    return f"./.data/{user_id}/batch-{batch_id}/{file_id}"
+
+def create(batch_id: str, user_id: str, submissions: list):
+    pipe = redis_client.pipeline()
+    pipe.hset(_key(batch_id), mapping={
+        "user_id": user_id,
+        "status": "queued",
+        "total": len(submissions),
+        "unique": 0,
+        "compiled": 0,
+        "compile_errors": 0,
+        "tested": 0,
+        "failed": 0,
+        "finished": 0,
+        "created_at": time.time()
+    })
+    pipe.hset(_submissions_key(batch_id), mapping={
+        submission["id"]: json.dumps({"id": submission["id"], "status": "queued"})
+        for submission in submissions
+    })
+    pipe.expire(_key(batch_id), settings.batch_ttl)
+    pipe.expire(_submissions_key(batch_id), settings.batch_ttl)
+    pipe.execute()
+
+def build_source(generated: dict, code: str):
+    return "\n".join((generated["include"], code, generated["main"]))
+
+def prepare(batch_id: str, data: TestDataRequest, submissions: list):
+    groups = {}
+    for submission in submissions:
+        generated = generate_data(data.model_copy(update={"code": submission["code"]}))
+        source = build_source(generated, submission["code"])
+        key = hashlib.sha256(source.encode()).hexdigest()
+        groups.setdefault(key, (source, []))[1].append(submission["id"])
+    pipe = redis_client.pipeline()
+    pipe.hset(_key(batch_id), mapping={"status": "running", "unique": len(groups)})
+    for source, ids in groups.values():
+        for submission_id in ids[1:]:
+            pipe.hset(_submissions_key(batch_id), submission_id, json.dumps({
+                "id": submission_id, "status": "queued", "duplicate_of": ids[0]
+            }))
+    pipe.execute()
+    return groups
+
+def _update(batch_id: str, ids: list, status: str, counter: str, **fields):
+    previous = redis_client.hmget(_submissions_key(batch_id), ids)
+    pipe = redis_client.pipeline()
+    for index, (submission_id, value) in enumerate(zip(ids, previous)):
+        record = json.loads(value) if value else {"id": submission_id}
+        record.update(status=status, **fields)
+        if index:
+            record["duplicate_of"] = ids[0]
+        pipe.hset(_submissions_key(batch_id), submission_id, json.dumps(record))
+    pipe.hincrby(_key(batch_id), counter, len(ids))
+    if status in FINAL_STATUSES:
+        pipe.hincrby(_key(batch_id), "finished", len(ids))
+    results = pipe.execute()
+    if status in FINAL_STATUSES:
+        finished, total = results[-1], int(redis_client.hget(_key(batch_id), "total") or 0)
+        if finished >= total:
+            redis_client.hset(_key(batch_id), mapping={"status": "done", "finished_at": time.time()})
+
+def _build_info(build: dict):
+    return {
+        "message": build["message"],
+        "return_code": build["return_code"],
+        "cached": build.get("cached", False),
+        "stderr": build.get("stderr", "")
+    }
+
+def record_build(batch_id: str, ids: list, build: dict, file_id: str = None):
+    if build["return_code"] != 0:
+        _update(batch_id, ids, "compile_error", "compile_errors", build=_build_info(build))
+    else:
+        _update(batch_id, ids, "compiled", "compiled", build=_build_info(build), file_id=file_id)
+
+def summarize(run: dict):
+    comparison = build_profiles.compare(run.get("result", []))
+    sequential = [row["sequential_time"] for row in comparison if row["sequential_time"] is not None]
+    best_time = sum(row["best_time"] for row in comparison) if comparison else None
+    sequential_time = sum(sequential) if len(sequential) == len(comparison) and comparison else None
+    return {
+        "functions": [
+            {key: row[key] for key in ("title", "sequential_time", "best_time", "best_thread")}
+            for row in comparison
+        ],
+        "sequential_time": round(sequential_time, 6) if sequential_time is not None else None,
+        "best_time": round(best_time, 6) if best_time is not None else None,
+        "speedup": round(sequential_time / best_time, 2) if sequential_time and best_time else None,
+        "analysis": [res.get("global_analysis", "") for res in run.get("result", [])]
+    }
+
+def record_run(batch_id: str, ids: list, file_id: str, run: dict):
+    fields = {
+        "file_id": file_id,
+        "return_code": run.get("return_code"),
+        "resources": run.get("resources"),
+        **summarize(run)
+    }
+    if "hardware" in run:
+        fields["hardware"] = run["hardware"]
+    if run.get("return_code") != 0 or "result" not in run:
+        _update(batch_id, ids, "failed", "failed", stderr=run.get("stderr", "")[-settings.batch_stderr_bytes:], **fields)
+    else:
+        _update(batch_id, ids, "tested", "tested", **fields)
+
+def record_failure(batch_id: str, ids: list, message: str):
+    _update(batch_id, ids, "failed", "failed", message=message)
+
+def report(batch_id: str, sort: str = "id", descending: bool = False):
+    if sort not in SORT_FIELDS:
+        raise HTTPException(400, f"Неизвестное поле сортировки: {sort}")
+    info = {key.decode(): value.decode() for key, value in redis_client.hgetall(_key(batch_id)).items()}
+    if not info:
+        raise HTTPException(404, "Пакет не найден")
+    submissions = [json.loads(value) for value in redis_client.hvals(_submissions_key(batch_id))]
+    present = [item for item in submissions if item.get(sort) is not None]
+    missing = [item for item in submissions if item.get(sort) is None]
+    present.sort(key=lambda item: item[sort], reverse=descending)
+    counters = ("total", "unique", "compiled", "compile_errors", "tested", "failed", "finished")
+    progress = {key: int(info.get(key, 0)) for key in counters}
+    progress["percent"] = round(progress["finished"] / progress["total"] * 100, 1) if progress["total"] else 100.0
+    return {
+        "batch_id": batch_id,
+        "status": info["status"],
+        "created_at": float(info["created_at"]),
+        "finished_at": float(info["finished_at"]) if "finished_at" in info else None,
+        "progress": progress,
+        "submissions": present + missing
+    }
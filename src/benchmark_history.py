@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from functools import lru_cache
+from collections import defaultdict
+import numpy as np
+from src.config import settings
+from src.dependencies import redis_client
+from src.system_info import get_system_info
+from src.build_profiles import DEFAULT_PROFILE
+
+COLUMNS = (
+    "recorded_at", "task_id", "user_id", "code_hash", "compiler", "machine",
+    "function", "case_index", "thread", "time", "acceleration", "efficiency"
+)
+
+@lru_cache(maxsize=None)
+def machine_fingerprint():
+    info = get_system_info()
+    return f"{info['processor_name']} ({info['physical_cores']} cores)"
+
+def file_hash(filename: str):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _filters(function: str, machine: str, thread: int, user_id: str, code_hash: str):
+    return (
+        ("function", function), ("machine", machine), ("thread", thread),
+        ("user_id", str(user_id) if user_id is not None else None), ("code_hash", code_hash)
+    )
+
+class SQLiteHistory:
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "benchmarks.sqlite")
+        self.local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS benchmarks ({', '.join(COLUMNS)})"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS benchmarks_lookup "
+                "ON benchmarks (function, machine, thread, recorded_at)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS benchmarks_owner "
+                "ON benchmarks (user_id, code_hash, function, recorded_at)"
+            )
+
+    def _connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.row_factory = sqlite3.Row
+            self.local.connection = connection
+        return connection
+
+    def insert(self, rows: list):
+        with self._connect() as connection:
+            connection.executemany(
+                f"INSERT INTO benchmarks VALUES ({', '.join('?' for _ in COLUMNS)})",
+                [tuple(row[column] for column in COLUMNS) for row in rows]
+            )
+
+    def query(self, function: str = None, machine: str = None, thread: int = None, limit: int = None,
+              user_id: str = None, code_hash: str = None):
+        conditions, params = [], []
+        for column, value in _filters(function, machine, thread, user_id, code_hash):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT * FROM benchmarks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY recorded_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._connect().execute(sql, params).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+class ParquetHistory:
+    def __init__(self, directory: str):
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.directory = os.path.join(directory, "benchmarks")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def insert(self, rows: list):
+        table = self.pa.Table.from_pylist([{column: row[column] for column in COLUMNS} for row in rows])
+        self.pa.parquet.write_table(table, os.path.join(self.directory, f"part-{uuid.uuid4().hex}.parquet"))
+
+    def query(self, function: str = None, machine: str = None, thread: int = None, limit: int = None,
+              user_id: str = None, code_hash: str = None):
+        if not os.listdir(self.directory):
+            return []
+        dataset = self.pa.dataset.dataset(self.directory, format="parquet")
+        expression = None
+        for column, value in _filters(function, machine, thread, user_id, code_hash):
+            if value is not None:
+                condition = self.pa.dataset.field(column) == value
+                expression = condition if expression is None else expression & condition
+        rows = dataset.to_table(filter=expression).sort_by("recorded_at").to_pylist()
+        return rows[-limit:] if limit else rows
+
+class RedisHistory:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    def _key(self, name: str):
+        return f"{self.prefix}:{name}"
+
+    def insert(self, rows: list):
+        pipe = redis_client.pipeline()
+        for row in rows:
+            row_id = uuid.uuid4().hex
+            pipe.hset(self._key("rows"), row_id, json.dumps({column: row[column] for column in COLUMNS}))
+            pipe.zadd(self._key("index"), {row_id: row["recorded_at"]})
+            for column, value in _filters(row["function"], row["machine"], row["thread"], row["user_id"], row["code_hash"]):
+                pipe.zadd(self._key(f"{column}:{value}"), {row_id: row["recorded_at"]})
+        pipe.execute()
+
+    def query(self, function: str = None, machine: str = None, thread: int = None, limit: int = None,
+              user_id: str = None, code_hash: str = None):
+        keys = [
+            self._key(f"{column}:{value}")
+            for column, value in _filters(function, machine, thread, user_id, code_hash)
+            if value is not None
+        ]
+        if len(keys) > 1:
+            row_ids = redis_client.zinter(keys, aggregate="MAX")
+        else:
+            row_ids = redis_client.zrange(keys[0] if keys else self._key("index"), 0, -1)
+        if limit:
+            row_ids = row_ids[-limit:]
+        if not row_ids:
+            return []
+        return [json.loads(value) for value in redis_client.hmget(self._key("rows"), row_ids) if value is not None]
+
+BACKENDS = {
+    "sqlite": SQLiteHistory,
+    "parquet": ParquetHistory,
+    "redis": RedisHistory,
+}
+
+@lru_cache(maxsize=None)
+def get_history():
+    backend = BACKENDS.get(settings.history_backend)
+    if backend is None:
+        raise ValueError(f"Неизвестное хранилище истории: {settings.history_backend}")
+    if backend is RedisHistory:
+        return backend(settings.history_redis_prefix)
+    return backend(os.path.join(os.getcwd(), settings.history_dir))
+
+def record(task_id: str, user_id: str, code_hash: str, compiler: str, results: list):
+    now = time.time()
+    machine = machine_fingerprint()
+    rows = []
+    for res in results:
+        profile = res.get("profile")
+        for dataset in res.get("results", []):
+            function = dataset.get("title", "")
+            if profile and profile != DEFAULT_PROFILE:
+                function = f"{function} [{profile}]"
+            for case_index, item in enumerate(dataset.get("data", [])):
+                for run in item.get("performance", []):
+                    rows.append({
+                        "recorded_at": now,
+                        "task_id": task_id,
+                        "user_id": str(user_id),
+                        "code_hash": code_hash,
+                        "compiler": compiler,
+                        "machine": machine,
+                        "function": function,
+                        "case_index": case_index,
+                        "thread": run["thread"],
+                        "time": run.get("time"),
+                        "acceleration": run.get("acceleration"),
+                        "efficiency": run.get("efficiency"),
+                    })
+    if rows:
+        get_history().insert(rows)
+    return rows
+
+def trend(function: str = None, machine: str = None, thread: int = None, limit: int = 500, user_id: str = None,
+          code_hash: str = None):
+    return get_history().query(function, machine, thread, limit, user_id, code_hash)
+
+def _welch_t(baseline: np.ndarray, recent: np.ndarray):
+    variance = baseline.var(ddof=1) / len(baseline) + recent.var(ddof=1) / len(recent)
+    if variance == 0:
+        return np.inf if recent.mean() > baseline.mean() else 0.0
+    return (recent.mean() - baseline.mean()) / np.sqrt(variance)
+
+def detect_regressions(function: str = None, machine: str = None, user_id: str = None, code_hash: str = None):
+    groups = defaultdict(list)
+    for row in get_history().query(function, machine, user_id=user_id, code_hash=code_hash):
+        if row["time"] is None:
+            continue
+        key = (row["user_id"], row["code_hash"], row["function"], row["case_index"], row["machine"], row["thread"])
+        groups[key].append(row["time"])
+
+    window = settings.history_regression_window
+    regressions = []
+    for (owner, code, function_name, case_index, machine_name, thread), times in groups.items():
+        if len(times) < window + settings.history_regression_min_baseline:
+            continue
+        recent = np.array(times[-window:], dtype=float)
+        baseline = np.array(times[-(window + settings.history_regression_baseline):-window], dtype=float)
+        slowdown = recent.mean() / baseline.mean() - 1 if baseline.mean() > 0 else 0
+        t_statistic = _welch_t(baseline, recent)
+        if slowdown >= settings.history_regression_threshold and t_statistic >= settings.history_regression_t:
+            regressions.append({
+                "user_id": owner,
+                "code_hash": code,
+                "function": function_name,
+                "case_index": case_index,
+                "machine": machine_name,
+                "thread": thread,
+                "baseline_time": round(float(baseline.mean()), 6),
+                "recent_time": round(float(recent.mean()), 6),
+                "slowdown_percent": round(float(slowdown) * 100, 1),
+                "t_statistic": round(float(t_statistic), 2) if np.isfinite(t_statistic) else None
+            })
+    return regressions
@@ -0,0 +1,61 @@
+from collections import defaultdict
+from fastapi import HTTPException
+
+DEFAULT_PROFILE = "default"
+
+PROFILES = {
+    "default": [],
+    "debug": ["-O0", "-g"],
+    "O2": ["-O2"],
+    "O3-native": ["-O3", "-march=native"],
+    "lto": ["-O2", "-flto=auto"],
+    "sanitize": ["-O1", "-g", "-fno-omit-frame-pointer", "-fsanitize=address,undefined"],
+}
+
+UNLIMITED_ADDRESS_SPACE = {"sanitize"}
+
+def get_flags(profile: str = None):
+    profile = profile or DEFAULT_PROFILE
+    if profile not in PROFILES:
+        raise HTTPException(400, f"Неизвестный профиль сборки: {profile}")
+    return PROFILES[profile]
+
+def validate(profiles: list):
+    for profile in profiles or []:
+        get_flags(profile)
+
+def binary_path(user_id: str, file_id: str, profile: str = None):
+    suffix = "" if profile is None else f".{profile}"
+    return f"./.data/{user_id}/{file_id}{suffix}.out"
+
+def source_path(user_id: str, file_id: str):
+    return f"./.data/{user_id}/{file_id}.cpp"
+
+def harness_path(user_id: str, file_id: str):
+    return f"./.data/{user_id}/{file_id}.harness.cpp"
+
+def compare(results: list):
+    totals = defaultdict(lambda: defaultdict(float))
+    for res in results:
+        profile = res.get("profile", DEFAULT_PROFILE)
+        for dataset in res.get("results", []):
+            for item in dataset.get("data", []):
+                for run in item.get("performance", []):
+                    if run.get("time") is not None:
+                        totals[(dataset.get("title", ""), profile)][run["thread"]] += run["time"]
+
+    comparison = []
+    baseline = {}
+    for (title, profile), times in totals.items():
+        best_thread = min(times, key=times.get)
+        best_time = times[best_thread]
+        baseline.setdefault(title, best_time)
+        comparison.append({
+            "title": title,
+            "profile": profile,
+            "sequential_time": round(times[1], 6) if 1 in times else None,
+            "best_time": round(best_time, 6),
+            "best_thread": best_thread,
+            "speedup_vs_first": round(baseline[title] / best_time, 2) if best_time else None
+        })
+    return comparison
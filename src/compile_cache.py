@@ -0,0 +1,87 @@
+import os
+import hashlib
+import datetime
+import src.compiler as compiler
+import src.warm_launcher as warm_launcher
+from src.config import settings
+from src.dependencies import redis_client
+from src.file_cache import FileCache
+from src.system_info import get_compiler_info
+
+cache = FileCache(
+    os.path.join(os.getcwd(), ".data", ".cache", "bin"),
+    settings.compile_cache_max_bytes
+)
+
+def cache_key(code: str, flags: list):
+    digest = hashlib.sha256()
+    digest.update(get_compiler_info().encode())
+    digest.update(b"\0")
+    digest.update(" ".join(flags).encode())
+    digest.update(b"\0")
+    digest.update(code.encode())
+    return digest.hexdigest()
+
+def _record(hit: bool, course_id: str = None):
+    course = course_id or "default"
+    week = datetime.date.today().strftime("%G-W%V")
+    key = f"compile_cache:stats:{course}:{week}"
+    pipe = redis_client.pipeline()
+    pipe.hincrby(key, "hits" if hit else "misses", 1)
+    pipe.sadd("compile_cache:index", f"{course}:{week}")
+    pipe.execute()
+
+def _build(src_filename: str, bin_filename: str, flags: list, harness_filename: str = None):
+    if harness_filename:
+        return compiler.compile_units([src_filename, harness_filename], bin_filename, flags)
+    return compiler.compile(src_filename, bin_filename, flags)
+
+def compile_with_cache(code: str, src_filename: str, bin_filename: str, course_id: str = None, flags: list = None,
+                       harness_filename: str = None):
+    flags = flags or []
+    if not settings.compile_cache_enabled:
+        return _build(src_filename, bin_filename, flags, harness_filename)
+
+    if harness_filename:
+        with open(harness_filename, 'r') as f:
+            code = f"{code}\0{f.read()}"
+    key = cache_key(code, compiler.link_signature(flags))
+    library = warm_launcher.shared_library_path(bin_filename)
+    library_key = f"{key}.so"
+    needs_library = warm_launcher.supports(flags) and not harness_filename
+    if cache.copy(key, bin_filename, mode=0o755) and (not needs_library or cache.copy(library_key, library, mode=0o755)):
+        _record(True, course_id)
+        return {
+            "message": "Сборка прошла успешно",
+            "stdout": "",
+            "stderr": "",
+            "return_code": 0,
+            "cached": True
+        }
+
+    _record(False, course_id)
+    result = _build(src_filename, bin_filename, flags, harness_filename)
+    if result["return_code"] == 0 and os.path.exists(bin_filename):
+        cache.put(key, bin_filename)
+        if os.path.exists(library):
+            cache.put(library_key, library)
+    return result
+
+def get_stats(course_id: str = None):
+    stats = []
+    for entry in sorted(redis_client.smembers("compile_cache:index")):
+        course, week = entry.decode().rsplit(":", 1)
+        if course_id and course != course_id:
+            continue
+        counters = redis_client.hgetall(f"compile_cache:stats:{course}:{week}")
+        hits = int(counters.get(b"hits", 0))
+        misses = int(counters.get(b"misses", 0))
+        total = hits + misses
+        stats.append({
+            "course_id": course,
+            "week": week,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0
+        })
+    return stats
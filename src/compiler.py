@@ -1,66 +1,115 @@
 import asyncio
 import subprocess
 import os
-import threading
-import json
 import glob
 import time
+import shutil
+import tempfile
+from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException
-from collections import defaultdict
-from contextlib import contextmanager
-from src.parallel_implemantation_analyzer import analyze_parallel_performance
+from src.config import settings
+from src.parallel_implemantation_analyzer import analyze_result_file
+from src.pch import get_pch_flags, is_pch_error
+from src.process_engine import engine, request_cancel
+from src.output_stream import OutputStream
+from src.sandbox import Sandbox
+import src.warm_launcher as warm_launcher
+import src.object_cache as object_cache
+import src.metrics as metrics
+import src.cpu_reservation as cpu_reservation
+import src.perf_counters as perf_counters
+import src.artifact_store as artifact_store
+from src.dependencies import redis_client
 
-processes = defaultdict(dict)
-lock = threading.Lock()
+processes = engine.processes
 
-@contextmanager
-def change_directory(destination: str):
-    original_dir = os.getcwd()
-    try:
-        os.chdir(destination)
-        yield
-    finally:
-        os.chdir(original_dir)
+COMPILE_FLAGS = ["-fopenmp"]
+LINK_FLAGS = ["-L/usr/lib", "-lavcodec", "-lavformat", "-lavutil", "-lswscale"]
+SHARED_FLAGS = ["-fPIC", "-shared"]
 
+build_executor = ThreadPoolExecutor(max_workers=settings.queue_concurrency.get("compile", 4))
 
-def run_subprocess(command: list, file_id: str, timeout: int = 30, input_data: str = None):
-    with lock:
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            stdin=subprocess.PIPE,
-            text=True
-        )
-        processes[file_id]['process'] = process
-    
+def run_subprocess(command: list, file_id: str, timeout: int = 30, input_data: str = None, cwd: str = None, output=None,
+                   cpus: list = None, env: dict = None):
+    env = {**metrics.trace_env(), **(env or {})} or None
+    cpus = cpus or cpu_reservation.general_cpus()
+    result = engine.run(command, file_id, timeout, input_data, cwd, output, cpus, env)
+    return result["return_code"], result["stdout"], result["stderr"]
+
+def run_binary(command: list, file_id: str, timeout: int, input_data: str = None, cwd: str = None, output=None,
+               cpus: list = None, env: dict = None, launch=None, limit_address_space: bool = True):
+    sandbox = None
+    if settings.sandbox_enabled and launch is None:
+        sandbox = Sandbox(timeout, cpus, limit_address_space)
+    env = {**metrics.trace_env(), **(env or {})} or None
+    running = artifact_store.running_key(file_id)
+    pipe = redis_client.pipeline()
+    pipe.incr(running)
+    pipe.expire(running, timeout + settings.cancel_ack_timeout + 60)
+    pipe.execute()
     try:
-        stdout, stderr = process.communicate(input=input_data, timeout=timeout)
-        return_code = process.returncode
-    except subprocess.TimeoutExpired:
-        process.kill()
-        stdout, stderr = process.communicate()
-        return_code = -1
+        with metrics.stage("run"):
+            return engine.run(command, file_id, timeout, input_data, cwd, output, cpus, env, sandbox, launch)
     finally:
-        with lock:
-            if file_id in processes:
-                del processes[file_id]
-    
-    return return_code, stdout, stderr
+        if redis_client.decr(running) <= 0:
+            redis_client.delete(running)
 
-def compile(src_filename: str, bin_filename: str):
-    file_id = os.path.basename(src_filename).split('.')[0]
-    command = [
-        "g++", 
-        "-fopenmp",
+@lru_cache(maxsize=None)
+def detect_linker():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for linker in settings.linker_preference:
+            command = ["g++", f"-fuse-ld={linker}", "-x", "c++", "-", "-o", os.path.join(tmp_dir, "probe")]
+            try:
+                result = subprocess.run(command, input="int main() { return 0; }", capture_output=True, text=True, timeout=30)
+            except (OSError, subprocess.TimeoutExpired):
+                continue
+            if result.returncode == 0:
+                return linker
+    return None
+
+def _linker_flags():
+    linker = detect_linker()
+    return [f"-fuse-ld={linker}"] if linker else []
+
+def link_signature(flags: list):
+    return [*COMPILE_FLAGS, *flags, *_linker_flags(), *LINK_FLAGS]
+
+def _compile_command(src_filename: str, bin_filename: str, extra_flags: list = None):
+    return [
+        "g++",
+        *COMPILE_FLAGS,
+        *(extra_flags or []),
+        *_linker_flags(),
         src_filename,
         "-o", bin_filename,
-        "-L/usr/lib",
-        "-lavcodec", "-lavformat", "-lavutil", "-lswscale",
+        *LINK_FLAGS,
     ]
+
+def _build_shared_library(src_filename: str, bin_filename: str, file_id: str, flags: list):
+    library = warm_launcher.shared_library_path(bin_filename)
+    command = ["g++", *COMPILE_FLAGS, *flags, *SHARED_FLAGS, src_filename, "-o", library, *LINK_FLAGS]
+    return_code, _, _ = run_subprocess(command, f"{file_id}:so")
+    if return_code != 0 and os.path.exists(library):
+        os.unlink(library)
+
+def compile(src_filename: str, bin_filename: str, flags: list = None):
+    flags = flags or []
+    file_id = os.path.basename(bin_filename).split('.')[0]
+    with open(src_filename, 'r') as f:
+        pch_flags = get_pch_flags(f.read(), COMPILE_FLAGS + flags)
+    library = None
+    if warm_launcher.supports(flags):
+        library = build_executor.submit(_build_shared_library, src_filename, bin_filename, file_id, flags)
     try:
-        return_code, stdout, stderr = run_subprocess(command, file_id)
+        with metrics.stage("compile"):
+            command = _compile_command(src_filename, bin_filename, flags + pch_flags)
+            return_code, stdout, stderr = run_subprocess(command, file_id)
+            if return_code != 0 and is_pch_error(pch_flags, stderr):
+                command = _compile_command(src_filename, bin_filename, flags)
+                return_code, stdout, stderr = run_subprocess(command, file_id)
+        if library is not None:
+            library.result()
         
         if return_code != 0:
             return {
@@ -79,45 +128,177 @@ def compile(src_filename: str, bin_filename: str):
     except Exception as e:
         raise HTTPException(500, f"Ошибка компиляции: {str(e)}")
 
-def execute(bin_filename: str, file_id: str, input_data: str = None):
+def _object_command(src_filename: str, obj_filename: str, dep_filename: str, extra_flags: list):
+    return [
+        "g++",
+        *COMPILE_FLAGS,
+        *extra_flags,
+        "-c", src_filename,
+        "-o", obj_filename,
+        "-MD", "-MF", dep_filename,
+    ]
+
+def _link_command(objects: list, bin_filename: str, flags: list):
+    return [
+        "g++",
+        *COMPILE_FLAGS,
+        *flags,
+        *_linker_flags(),
+        *objects,
+        "-o", bin_filename,
+        *LINK_FLAGS,
+    ]
+
+def _compile_object(src_filename: str, file_id: str, index: int, flags: list):
+    with open(src_filename, 'r') as f:
+        code = f.read()
+    obj_filename = f"{os.path.splitext(src_filename)[0]}.o"
+    dep_filename = f"{obj_filename}.d"
+    key = object_cache.source_key(code, COMPILE_FLAGS + flags)
+    if settings.object_cache_enabled and object_cache.lookup(key, obj_filename):
+        return {"object": obj_filename, "cached": True, "return_code": 0, "stdout": "", "stderr": ""}
+
+    pch_flags = get_pch_flags(code, COMPILE_FLAGS + flags)
+    try:
+        command = _object_command(src_filename, obj_filename, dep_filename, flags + pch_flags)
+        return_code, stdout, stderr = run_subprocess(command, f"{file_id}:{index}")
+        if return_code != 0 and is_pch_error(pch_flags, stderr):
+            command = _object_command(src_filename, obj_filename, dep_filename, flags)
+            return_code, stdout, stderr = run_subprocess(command, f"{file_id}:{index}")
+        if return_code == 0 and settings.object_cache_enabled:
+            object_cache.store(key, src_filename, obj_filename, dep_filename)
+    finally:
+        if os.path.exists(dep_filename):
+            os.unlink(dep_filename)
+    return {"object": obj_filename, "cached": False, "return_code": return_code, "stdout": stdout, "stderr": stderr}
+
+def compile_units(sources: list, bin_filename: str, flags: list = None):
+    flags = flags or []
+    file_id = os.path.basename(bin_filename).split('.')[0]
+    units = []
+    try:
+        futures = [
+            build_executor.submit(_compile_object, src_filename, file_id, index, flags)
+            for index, src_filename in enumerate(sources)
+        ]
+        with metrics.stage("compile"):
+            units = [future.result() for future in futures]
+        stdout = "".join(unit["stdout"] for unit in units)
+        stderr = "".join(unit["stderr"] for unit in units)
+        return_code = next((unit["return_code"] for unit in units if unit["return_code"] != 0), 0)
+
+        if return_code == 0:
+            command = _link_command([unit["object"] for unit in units], bin_filename, flags)
+            with metrics.stage("link"):
+                return_code, link_stdout, link_stderr = run_subprocess(command, file_id)
+            stdout += link_stdout
+            stderr += link_stderr
+
+        result = {
+            "message": f"Ошибка компиляции: {stderr}" if return_code != 0 else "Сборка прошла успешно",
+            "stdout": stdout,
+            "stderr": stderr,
+            "return_code": return_code,
+            "objects": {
+                "cached": sum(1 for unit in units if unit["cached"]),
+                "compiled": sum(1 for unit in units if not unit["cached"])
+            }
+        }
+        if return_code == 0:
+            result["linker"] = detect_linker() or "ld"
+        return result
+
+    except Exception as e:
+        raise HTTPException(500, f"Ошибка компиляции: {str(e)}")
+    finally:
+        for unit in units:
+            if os.path.exists(unit["object"]):
+                os.unlink(unit["object"])
+
+def execute(bin_filename: str, file_id: str, input_data: str = None, stream_id: str = None, cpus: list = None,
+            limit_address_space: bool = True):
     file_dir = os.path.dirname(bin_filename)
     filename = os.path.basename(bin_filename)
     command = [f"./{filename}"]
+    output = OutputStream(stream_id) if stream_id else None
     
     try:
-        with change_directory(file_dir):
-            return_code, stdout, stderr = run_subprocess(command, file_id, 600, input_data)
-        
-        return {
+        launch = warm_launcher.prepare(bin_filename, LINK_FLAGS, cpus, 600) if limit_address_space else None
+        run = run_binary(command, file_id, 600, input_data, file_dir, output, cpus, launch=launch,
+                         limit_address_space=limit_address_space)
+        result = {
             "message": "Выполнение завершено",
-            "stdout": stdout,
-            "stderr": stderr,
-            "return_code": return_code
+            "stdout": run["stdout"],
+            "stderr": run["stderr"],
+            "return_code": run["return_code"],
+            "resources": run["resources"]
         }
+        if launch is not None:
+            warm_launcher.record(launch)
+            result["launch"] = {"mode": launch.mode, "latency_ms": launch.latency_ms}
+        return result
         
     except Exception as e:
         raise HTTPException(500, f"Ошибка выполнения: {str(e)}")
 
-def execute_test(bin_filename: str, file_id: str, input_data: str = None):
+def omp_env(cpus: list):
+    return {
+        "OMP_PROC_BIND": "close",
+        "OMP_PLACES": ",".join(f"{{{cpu}}}" for cpu in cpus),
+    }
+
+def _move_result_dir(file_dir: str, profile: str, name: str):
+    profile_dir = os.path.join(file_dir, profile)
+    os.makedirs(profile_dir, exist_ok=True)
+    target = os.path.join(profile_dir, name)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(os.path.join(file_dir, name), target)
+    return target
+
+def execute_test(bin_filename: str, file_id: str, input_data: str = None, cpus: list = None, profile: str = None,
+                 limit_address_space: bool = True, counters: bool = False):
     file_dir = os.path.dirname(bin_filename)
     filename = os.path.basename(bin_filename)
     command = [f"./{filename}"]
+    env = omp_env(cpus) if cpus else None
+    hardware = None
+    perf_filename = None
+    if counters:
+        if perf_counters.available():
+            perf_filename = os.path.join(file_dir, f".perf-{file_id}.csv")
+            command = perf_counters.wrap(command, os.path.basename(perf_filename))
+        else:
+            hardware = {"available": False, "message": "Аппаратные счетчики недоступны на этом узле"}
     
     try:
-        with change_directory(file_dir):
-            return_code, stdout, stderr = run_subprocess(command, file_id, 60, input_data)
-            result = []
-            
-            for dir_entry in os.scandir('.'):
+        started = time.time()
+        run = run_binary(
+            command, file_id, settings.test_timeout, input_data, file_dir,
+            cpus=cpus, env=env, limit_address_space=limit_address_space
+        )
+        return_code, stdout, stderr = run["return_code"], run["stdout"], run["stderr"]
+        if perf_filename:
+            hardware = perf_counters.collect(perf_filename, time.time() - started)
+        result = []
+        
+        with metrics.stage("parse"):
+            for dir_entry in os.scandir(file_dir):
                 if dir_entry.is_dir():
                     file_path = os.path.join(dir_entry.path, 'result.json')
                     if os.path.exists(file_path):
+                        if profile is not None and os.path.getmtime(file_path) < started:
+                            continue
                         try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                load_data = json.load(f)
-                                data = analyze_parallel_performance(load_data)
+                            if profile is not None:
+                                file_path = os.path.join(_move_result_dir(file_dir, profile, dir_entry.name), 'result.json')
+                            data = analyze_result_file(file_path)
+                            if profile is not None:
+                                data['dir'] = f"{profile}/{dir_entry.name}"
+                                data['profile'] = profile
+                            else:
                                 data['dir'] = dir_entry.name
-                                result.append(data)
+                            result.append(data)
                         except Exception as e:
                             raise HTTPException(500, f"Error read result file: {str(e)}")
         if len(result) == 0:
@@ -125,7 +306,9 @@ def execute_test(bin_filename: str, file_id: str, input_data: str = None):
                 "message": "Выполнение завершено",
                 "stdout": stdout,
                 "stderr": stderr,
-                "return_code": return_code
+                "return_code": return_code,
+                "resources": run["resources"],
+                **({"hardware": hardware} if hardware else {})
             }    
 
         return {
@@ -133,7 +316,9 @@ def execute_test(bin_filename: str, file_id: str, input_data: str = None):
             "stdout": stdout,
             "stderr": stderr,
             "return_code": return_code,
-            "result": result
+            "resources": run["resources"],
+            "result": result,
+            **({"hardware": hardware} if hardware else {})
         }
         
     except Exception as e:
@@ -141,16 +326,10 @@ def execute_test(bin_filename: str, file_id: str, input_data: str = None):
 
 
 def cancel(file_id: str):
-    with lock:
-        if file_id in processes and processes[file_id].get('process'):
-            process = processes[file_id]['process']
-            try:
-                process.terminate()
-                time.sleep(1)
-                if process.poll() is None:
-                    process.kill()
-                return {"message": "Процесс остановлен"}
-            except Exception as e:
-                return {"message": f"Ошибка отмены: {str(e)}"}
+    try:
+        if request_cancel(file_id):
+            return {"message": "Процесс остановлен"}
+    except Exception as e:
+        return {"message": f"Ошибка отмены: {str(e)}"}
     
     return {"message": "Процесс не найден"}
\ No newline at end of file
@@ -9,5 +9,91 @@ class Settings(BaseSettings):
     flower_port: int = 5555
     server_lessons_url: str = "http://server_lessons:8000/notifications"
     input_analyzer_url: str = "http://input_analyzer:8003/analyze"
+    compile_cache_enabled: bool = True
+    compile_cache_max_bytes: int = 2 * 1024 ** 3
+    pch_enabled: bool = True
+    pch_build_timeout: int = 120
+    pch_retry_interval: int = 300
+    task_priority_levels: int = 10
+    task_default_priority: int = 5
+    control_priority: int = 0
+    fair_retry_priority: int = 9
+    fair_retry_countdown: int = 2
+    user_slot_ttl: int = 900
+    user_max_active_tasks: dict = {"compile": 2, "execute": 2, "benchmark": 1}
+    queue_concurrency: dict = {"compile": 4, "execute": 32, "benchmark": 1, "control": 2, "upload": 2}
+    queue_pool: dict = {"execute": "threads"}
+    output_max_bytes: int = 16 * 1024 ** 2
+    stream_max_bytes: int = 8 * 1024 ** 2
+    stream_max_total_bytes: int = 12 * 1024 ** 2
+    stream_max_entries: int = 10000
+    stream_ttl: int = 3600
+    stream_block_ms: int = 15000
+    stream_idle_timeout: int = 660
+    task_events_timeout: int = 900
+    ack_timeout: int = 20
+    ack_extended_timeout: int = 24 * 3600
+    ack_check_interval: int = 10
+    server_lessons_batch_url: str | None = None
+    http_timeout: float = 30.0
+    http_connect_timeout: float = 5.0
+    http_max_connections_per_host: int = 50
+    http_max_keepalive_per_host: int = 20
+    http_keepalive_expiry: float = 60.0
+    analyzer_cache_ttl: int = 24 * 3600
+    analyzer_cache_max_entries: int = 50000
+    analyzer_cache_max_value_bytes: int = 256 * 1024
+    analyzer_workers: int = 4
+    s3_download_workers: int = 8
+    s3_cache_max_bytes: int = 20 * 1024 ** 3
+    s3_upload_workers: int = 8
+    s3_multipart_threshold: int = 16 * 1024 ** 2
+    s3_multipart_chunksize: int = 16 * 1024 ** 2
+    s3_multipart_concurrency: int = 4
+    s3_pack_outputs: bool = False
+    s3_pack_min_files: int = 50
+    s3_background_upload: bool = False
+    binary_info_ttl: int = 30 * 24 * 3600
+    history_backend: str = "redis"
+    history_dir: str = ".data/.history"
+    history_redis_prefix: str = "benchmark_history"
+    history_regression_window: int = 5
+    history_regression_baseline: int = 20
+    history_regression_min_baseline: int = 5
+    history_regression_threshold: float = 0.05
+    history_regression_t: float = 3.0
+    test_timeout: int = 60
+    default_run_time_estimate: float = 0.1
+    benchmark_cpus: str | None = None
+    benchmark_slot_size: int = 0
+    benchmark_slot_ttl: int = 900
+    benchmark_slot_retry_countdown: int = 5
+    sandbox_enabled: bool = True
+    sandbox_cgroup_root: str | None = None
+    sandbox_memory_bytes: int = 4 * 1024 ** 3
+    sandbox_max_processes: int = 512
+    sandbox_file_size_bytes: int = 1024 ** 3
+    launcher_enabled: bool = False
+    launcher_pool_size: int = 2
+    object_cache_enabled: bool = True
+    object_cache_max_bytes: int = 2 * 1024 ** 3
+    linker_preference: list = ["mold", "lld", "gold"]
+    artifact_user_quota_bytes: int = 1024 ** 3
+    artifact_global_quota_bytes: int = 50 * 1024 ** 3
+    artifact_max_age: int = 14 * 24 * 3600
+    artifact_gc_interval: int = 300
+    artifact_gc_batch: int = 100
+    tmp_source_max_age: int = 600
+    metrics_multiproc_dir: str = ".data/.metrics"
+    worker_metrics_port: int = 9100
+    tracing_enabled: bool = False
+    tracing_otlp_endpoint: str | None = None
+    batch_ttl: int = 7 * 24 * 3600
+    batch_max_submissions: int = 500
+    batch_priority: int = 7
+    batch_stderr_bytes: int = 4096
+    system_info_refresh_interval: int = 60
+    node_info_ttl: int = 180
+    cancel_ack_timeout: int = 3
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,43 @@
+import os
+import socket
+from functools import lru_cache
+from src.config import settings
+from src.dependencies import redis_client
+from src.system_info import parse_cpu_list
+
+RELEASE_SCRIPT = redis_client.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+""")
+
+@lru_cache(maxsize=None)
+def benchmark_slots():
+    if not settings.benchmark_cpus:
+        return []
+    available = os.sched_getaffinity(0)
+    cpus = [cpu for cpu in parse_cpu_list(settings.benchmark_cpus) if cpu in available]
+    size = settings.benchmark_slot_size or len(cpus)
+    return [cpus[i:i + size] for i in range(0, len(cpus) - size + 1, size)] if size else []
+
+@lru_cache(maxsize=None)
+def general_cpus():
+    reserved = {cpu for slot in benchmark_slots() for cpu in slot}
+    if not reserved:
+        return None
+    cpus = sorted(os.sched_getaffinity(0) - reserved)
+    return cpus or None
+
+def _slot_key(index: int):
+    return f"cpu_slot:{socket.gethostname()}:{index}"
+
+def reserve(task_id: str):
+    for index, cpus in enumerate(benchmark_slots()):
+        if redis_client.set(_slot_key(index), task_id, nx=True, ex=settings.benchmark_slot_ttl):
+            return index, cpus
+    return None, None
+
+def release(index: int, task_id: str):
+    if index is not None:
+        RELEASE_SCRIPT(keys=[_slot_key(index)], args=[task_id])
@@ -1,15 +1,22 @@
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from celery import Celery
+from kombu import Queue
 from src.config import settings
 from src.s3_client import S3Client
 
 redis_client = Redis(host=settings.redis_host, port=settings.redis_port, db=settings.redis_db)
+async_redis_client = AsyncRedis(host=settings.redis_host, port=settings.redis_port, db=settings.redis_db)
+async_result_client = AsyncRedis.from_url(settings.result_backend)
 s3_client = S3Client()
 
+TASK_QUEUES = ("compile", "execute", "benchmark", "control", "upload")
+PENDING_ACK_DEADLINES = "pending_ack_deadlines"
+
 def get_celery_app():
     app = Celery(
         'main',
-        brocker=settings.broker_url,
+        broker=settings.broker_url,
         backend=settings.result_backend,
         include=['src.tasks']
     )
@@ -17,6 +24,35 @@ def get_celery_app():
         flower={
             'port': settings.flower_port,
             'address': '0.0.0.0'
+        },
+        task_queues=[
+            Queue(name, queue_arguments={'x-max-priority': settings.task_priority_levels})
+            for name in TASK_QUEUES
+        ],
+        task_default_queue="compile",
+        task_default_priority=settings.task_default_priority,
+        task_routes={
+            'src.tasks.compile_task': {'queue': 'compile'},
+            'src.tasks.execute_task': {'queue': 'execute'},
+            'src.tasks.execute_test_task': {'queue': 'benchmark'},
+            'src.tasks.cancel_task': {'queue': 'control', 'priority': settings.control_priority},
+            'src.tasks.upload_results_task': {'queue': 'upload'},
+            'src.tasks.collect_garbage_task': {'queue': 'control'},
+            'src.tasks.batch_task': {'queue': 'compile', 'priority': settings.batch_priority},
+            'src.tasks.batch_compile_task': {'queue': 'compile', 'priority': settings.batch_priority},
+            'src.tasks.batch_test_task': {'queue': 'benchmark', 'priority': settings.batch_priority},
+        },
+        beat_schedule={
+            'collect-garbage': {
+                'task': 'src.tasks.collect_garbage_task',
+                'schedule': settings.artifact_gc_interval,
+            },
+        },
+        worker_prefetch_multiplier=1,
+        broker_transport_options={
+            'priority_steps': list(range(settings.task_priority_levels)),
+            'sep': ':',
+            'queue_order_strategy': 'priority',
         }
     )
     return app
\ No newline at end of file
@@ -0,0 +1,93 @@
+import os
+import fcntl
+import shutil
+import uuid
+
+FICLONE = 0x40049409
+
+
+def clone_or_copy(src: str, dst: str, mode: int = 0o644):
+    tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(src, 'rb') as source, open(tmp, 'wb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+            except OSError:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+        shutil.copystat(src, tmp)
+        os.chmod(tmp, mode)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+class FileCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, src: str, move: bool = False):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        if move:
+            os.chmod(src, 0o444)
+            os.replace(src, path)
+        else:
+            clone_or_copy(src, path, 0o444)
+        self.evict()
+        return path
+
+    def copy(self, key: str, dst: str, size: int = None, mode: int = 0o644) -> bool:
+        path = self.get(key)
+        if path is None:
+            return False
+        try:
+            if size is not None and os.path.getsize(path) != size:
+                os.unlink(path)
+                return False
+            clone_or_copy(path, dst, mode)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def evict(self) -> int:
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.tmp') or not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except FileNotFoundError:
+            return 0
+
+        freed = 0
+        if total <= self.max_bytes:
+            return freed
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
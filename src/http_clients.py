@@ -0,0 +1,70 @@
+import httpx
+import threading
+from urllib.parse import urlsplit
+from src.config import settings
+
+async_clients = {}
+sync_clients = {}
+_sync_lock = threading.Lock()
+
+def _http2_available():
+    try:
+        import h2
+    except ImportError:
+        return False
+    return True
+
+def _client_options():
+    return {
+        "http2": _http2_available(),
+        "timeout": httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections_per_host,
+            max_keepalive_connections=settings.http_max_keepalive_per_host,
+            keepalive_expiry=settings.http_keepalive_expiry
+        ),
+    }
+
+def _origin(url: str):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    origin = _origin(url)
+    client = async_clients.get(origin)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        async_clients[origin] = client
+    return client
+
+def get_sync_client(url: str) -> httpx.Client:
+    origin = _origin(url)
+    client = sync_clients.get(origin)
+    if client is not None and not client.is_closed:
+        return client
+    with _sync_lock:
+        client = sync_clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.Client(**_client_options())
+            sync_clients[origin] = client
+        return client
+
+def open_async_clients():
+    for url in (settings.input_analyzer_url, settings.server_lessons_url):
+        get_async_client(url)
+
+async def close_async_clients():
+    for client in async_clients.values():
+        await client.aclose()
+    async_clients.clear()
+
+def open_sync_clients():
+    with _sync_lock:
+        sync_clients.clear()
+    get_sync_client(settings.input_analyzer_url)
+
+def close_sync_clients():
+    with _sync_lock:
+        for client in sync_clients.values():
+            client.close()
+        sync_clients.clear()
@@ -0,0 +1,63 @@
+#include <dlfcn.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+
+#define REQUEST_SIZE 8192
+
+typedef int (*main_fn)(int, char **, char **);
+
+extern char **environ;
+
+int main(int argc, char **argv) {
+    if (argc < 3) {
+        return 2;
+    }
+    int control_fd = atoi(argv[1]);
+    int ready_fd = atoi(argv[2]);
+
+    char request[REQUEST_SIZE];
+    size_t size = 0;
+    ssize_t count;
+    while (size < REQUEST_SIZE - 1 && (count = read(control_fd, request + size, REQUEST_SIZE - 1 - size)) > 0) {
+        size += count;
+    }
+    close(control_fd);
+    if (size == 0) {
+        return 0;
+    }
+    request[size] = '\0';
+
+    char *cwd = request;
+    char *path = cwd + strlen(cwd) + 1;
+    char *name = path + strlen(path) + 1;
+    if (name >= request + size || chdir(cwd) != 0) {
+        fprintf(stderr, "launcher: invalid request\n");
+        return 127;
+    }
+
+    void *handle = dlopen(path, RTLD_NOW | RTLD_GLOBAL);
+    if (handle == NULL) {
+        fprintf(stderr, "launcher: %s\n", dlerror());
+        return 127;
+    }
+    main_fn entry = (main_fn)dlsym(handle, "main");
+    if (entry == NULL) {
+        fprintf(stderr, "launcher: %s\n", dlerror());
+        return 127;
+    }
+
+    struct timespec now;
+    char ready[64];
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    int length = snprintf(ready, sizeof(ready), "%lld.%09ld", (long long)now.tv_sec, now.tv_nsec);
+    if (write(ready_fd, ready, length) != length) {
+        return 127;
+    }
+    close(ready_fd);
+
+    char *child_argv[] = {name, NULL};
+    exit(entry(1, child_argv, environ));
+}
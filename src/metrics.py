@@ -0,0 +1,156 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from celery.signals import before_task_publish, task_prerun, task_postrun, worker_process_shutdown
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from src.config import settings
+
+try:
+    from opentelemetry import context as otel_context, propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+except ImportError:
+    trace = None
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds",
+    "Длительность этапов обработки задач",
+    ["task", "stage"],
+    buckets=STAGE_BUCKETS
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "task_queue_wait_seconds",
+    "Время ожидания задачи в очереди",
+    ["task"],
+    buckets=STAGE_BUCKETS
+)
+TASK_SECONDS = Histogram(
+    "task_duration_seconds",
+    "Полное время выполнения задачи",
+    ["task", "state"],
+    buckets=STAGE_BUCKETS
+)
+HTTP_SECONDS = Histogram(
+    "http_request_seconds",
+    "Время обработки HTTP-запросов",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS
+)
+TASKS_TOTAL = Counter("tasks_total", "Количество завершенных задач", ["task", "state"])
+
+current_task = ContextVar("current_task", default="api")
+active_tasks = {}
+tracer = None
+
+def init_tracing(service_name: str):
+    global tracer
+    if tracer is not None or trace is None or not settings.tracing_enabled:
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    exporter = ConsoleSpanExporter()
+    if settings.tracing_otlp_endpoint:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+        except ImportError:
+            pass
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    tracer = trace.get_tracer("server_compiler")
+
+@contextmanager
+def span(name: str, **attributes):
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes={k: str(v) for k, v in attributes.items() if v is not None}) as current:
+        yield current
+
+@contextmanager
+def stage(name: str):
+    task = current_task.get()
+    started = time.perf_counter()
+    try:
+        with span(f"{task}.{name}", stage=name):
+            yield
+    finally:
+        STAGE_SECONDS.labels(task, name).observe(time.perf_counter() - started)
+
+def set_attributes(**attributes):
+    if tracer is None:
+        return
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, str(value))
+
+def trace_env():
+    if tracer is None:
+        return {}
+    carrier = {}
+    propagate.inject(carrier)
+    return {key.upper(): value for key, value in carrier.items()}
+
+def _short_name(name: str):
+    return name.rsplit(".", 1)[-1] if name else "unknown"
+
+@before_task_publish.connect
+def on_task_publish(headers=None, **kwargs):
+    if headers is None:
+        return
+    headers["published_at"] = time.time()
+    if tracer is not None:
+        propagate.inject(headers)
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, task=None, **kwargs):
+    name = _short_name(task.name)
+    token = current_task.set(name)
+    published_at = getattr(task.request, "published_at", None)
+    if published_at:
+        QUEUE_WAIT_SECONDS.labels(name).observe(max(time.time() - float(published_at), 0))
+
+    context_token, task_span = None, None
+    init_tracing(os.environ.get("OTEL_SERVICE_NAME", "server_compiler-worker"))
+    if tracer is not None:
+        carrier = {key: getattr(task.request, key, None) for key in ("traceparent", "tracestate")}
+        context = propagate.extract({key: value for key, value in carrier.items() if value})
+        task_span = tracer.start_span(f"celery.{name}", context=context, attributes={"task_id": task_id})
+        context_token = otel_context.attach(trace.set_span_in_context(task_span))
+    active_tasks[task_id] = (time.perf_counter(), token, task_span, context_token)
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    entry = active_tasks.pop(task_id, None)
+    if entry is None:
+        return
+    started, token, task_span, context_token = entry
+    name = _short_name(task.name)
+    TASK_SECONDS.labels(name, state or "UNKNOWN").observe(time.perf_counter() - started)
+    TASKS_TOTAL.labels(name, state or "UNKNOWN").inc()
+    if task_span is not None:
+        task_span.set_attribute("state", state or "UNKNOWN")
+        task_span.end()
+        otel_context.detach(context_token)
+    current_task.reset(token)
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(pid=None, **kwargs):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+def registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        collector = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector)
+        return collector
+    return REGISTRY
+
+def render():
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,91 @@
+import json
+import asyncio
+import threading
+from celery.signals import worker_ready, worker_shutdown
+from src.config import settings
+from src.dependencies import redis_client, async_redis_client
+from src.system_info import get_system_info
+import src.cpu_reservation as cpu_reservation
+
+NODES_KEY = "node_info:hosts"
+
+cached_info = None
+_stop = threading.Event()
+
+def _node_key(hostname: str):
+    return f"node_info:{hostname}"
+
+def _queue_key(queue: str):
+    return f"node_info:queue:{queue}"
+
+def publish(queues: list = ()):
+    info = get_system_info()
+    slots = cpu_reservation.benchmark_slots()
+    info['benchmark_slot_cpus'] = len(slots[0]) if slots else None
+    pipe = redis_client.pipeline()
+    pipe.set(_node_key(info['hostname']), json.dumps(info), ex=settings.node_info_ttl)
+    pipe.sadd(NODES_KEY, info['hostname'])
+    for queue in queues:
+        pipe.sadd(_queue_key(queue), info['hostname'])
+        pipe.expire(_queue_key(queue), settings.node_info_ttl)
+    pipe.execute()
+    return info
+
+def list_nodes(queue: str = None):
+    hostnames = sorted(member.decode() for member in redis_client.smembers(_queue_key(queue) if queue else NODES_KEY))
+    if not hostnames:
+        return []
+    values = redis_client.mget([_node_key(hostname) for hostname in hostnames])
+    return [json.loads(value) for value in values if value is not None]
+
+def _publish_loop(queues: list):
+    while not _stop.is_set():
+        try:
+            publish(queues)
+        except Exception as e:
+            print(f"Ошибка публикации информации об узле: {e}")
+        _stop.wait(settings.system_info_refresh_interval)
+
+@worker_ready.connect
+def start_publishing(sender=None, **kwargs):
+    queues = list(sender.app.amqp.queues.consume_from) if sender is not None else []
+    _stop.clear()
+    threading.Thread(target=_publish_loop, args=(queues,), name="node-info", daemon=True).start()
+
+@worker_shutdown.connect
+def stop_publishing(**kwargs):
+    _stop.set()
+
+async def refresh_system_info():
+    global cached_info
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                cached_info = await loop.run_in_executor(None, get_system_info)
+            except Exception as e:
+                print(f"Ошибка сбора информации о системе: {e}")
+            await asyncio.sleep(settings.system_info_refresh_interval)
+    except asyncio.CancelledError:
+        print("Обновление информации о системе остановлено")
+
+async def get_nodes():
+    hostnames = sorted(member.decode() for member in await async_redis_client.smembers(NODES_KEY))
+    if not hostnames:
+        return []
+    values = await async_redis_client.mget([_node_key(hostname) for hostname in hostnames])
+    nodes, expired = [], []
+    for hostname, value in zip(hostnames, values):
+        if value is None:
+            expired.append(hostname)
+        else:
+            nodes.append(json.loads(value))
+    if expired:
+        await async_redis_client.srem(NODES_KEY, *expired)
+    return nodes
+
+async def get_info():
+    local = cached_info
+    if local is None:
+        local = await asyncio.get_running_loop().run_in_executor(None, get_system_info)
+    return {**local, "nodes": await get_nodes()}
@@ -0,0 +1,59 @@
+import os
+import json
+import uuid
+import hashlib
+from src.config import settings
+from src.file_cache import FileCache
+from src.pch import read_deps
+from src.system_info import get_compiler_info
+
+cache = FileCache(
+    os.path.join(os.getcwd(), ".data", ".cache", "obj"),
+    settings.object_cache_max_bytes
+)
+MANIFEST_DIR = os.path.join(os.getcwd(), ".data", ".cache", "obj-manifests")
+
+def source_key(code: str, flags: list):
+    digest = hashlib.sha256()
+    digest.update(get_compiler_info().encode())
+    digest.update(b"\0")
+    digest.update(" ".join(flags).encode())
+    digest.update(b"\0")
+    digest.update(code.encode())
+    return digest.hexdigest()
+
+def _stat(path: str):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _manifest_path(key: str):
+    return os.path.join(MANIFEST_DIR, f"{key}.json")
+
+def lookup(key: str, obj_filename: str) -> bool:
+    try:
+        with open(_manifest_path(key)) as f:
+            manifest = json.load(f)
+        for path, stat in manifest["deps"].items():
+            if _stat(path) != stat:
+                return False
+    except (OSError, ValueError, KeyError):
+        return False
+    return cache.copy(manifest["object"], obj_filename)
+
+def store(key: str, src_filename: str, obj_filename: str, dep_filename: str):
+    try:
+        deps = {
+            path: _stat(path)
+            for path in read_deps(dep_filename)
+            if os.path.abspath(path) != os.path.abspath(src_filename)
+        }
+    except OSError:
+        return
+    object_key = hashlib.sha256(f"{key}\0{json.dumps(deps, sort_keys=True)}".encode()).hexdigest()
+    cache.put(object_key, obj_filename)
+
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    tmp = f"{_manifest_path(key)}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({"deps": deps, "object": object_key}, f)
+    os.replace(tmp, _manifest_path(key))
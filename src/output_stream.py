@@ -0,0 +1,91 @@
+import asyncio
+import codecs
+import json
+from src.config import settings
+from src.dependencies import async_redis_client
+
+class OutputStream:
+    def __init__(self, task_id: str):
+        self.key = f"output:{task_id}"
+        self.sent = {"stdout": 0, "stderr": 0}
+        self.total = 0
+        self.truncated = False
+        self.decoders = {
+            name: codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for name in self.sent
+        }
+        self.queue = None
+        self.consumer = None
+
+    async def open(self):
+        self.queue = asyncio.Queue()
+        self.consumer = asyncio.create_task(self._consume())
+
+    def write(self, name: str, data: bytes):
+        allowed = min(
+            settings.stream_max_bytes - self.sent[name],
+            settings.stream_max_total_bytes - self.total
+        )
+        if allowed < len(data):
+            self.truncated = True
+        if allowed <= 0:
+            return
+        chunk = data[:allowed]
+        self.sent[name] += len(chunk)
+        self.total += len(chunk)
+        text = self.decoders[name].decode(chunk)
+        if text:
+            self.queue.put_nowait({"type": name, "data": text})
+
+    async def close(self, return_code: int):
+        for name, decoder in self.decoders.items():
+            text = decoder.decode(b"", final=True)
+            if text:
+                self.queue.put_nowait({"type": name, "data": text})
+        self.queue.put_nowait({
+            "type": "end",
+            "return_code": str(return_code),
+            "truncated": "1" if self.truncated else "0"
+        })
+        self.queue.put_nowait(None)
+        await self.consumer
+
+    async def _consume(self):
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                break
+            try:
+                await async_redis_client.xadd(
+                    self.key,
+                    message,
+                    maxlen=settings.stream_max_entries,
+                    approximate=True
+                )
+                await async_redis_client.expire(self.key, settings.stream_ttl)
+            except Exception:
+                pass
+
+async def output_events(task_id: str, last_id: str = "0"):
+    key = f"output:{task_id}"
+    idle = 0
+    while idle < settings.stream_idle_timeout:
+        entries = await async_redis_client.xread(
+            {key: last_id},
+            block=settings.stream_block_ms,
+            count=100
+        )
+        if not entries:
+            idle += settings.stream_block_ms / 1000
+            yield ": keep-alive\n\n"
+            continue
+
+        idle = 0
+        for _, messages in entries:
+            for message_id, fields in messages:
+                last_id = message_id.decode()
+                message = {k.decode(): v.decode() for k, v in fields.items()}
+                event = message.pop("type")
+                yield f"id: {last_id}\nevent: {event}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+                if event == "end":
+                    return
@@ -1,91 +1,218 @@
 import json
-from typing import Dict, List, Any
+import numpy as np
+from typing import Dict, List, Any, Iterable
 
-def analyze_parallel_performance(input_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+GOOD_EFFICIENCY_ANALYSIS = "Параллельная реализация показывает хорошую эффективность (>80%) во всех тестах"
+INTERVAL_KEYS = ("interval", "confidence_interval")
+
+def _time_bounds(run: Dict[str, Any]):
+    time = run.get("time")
+    for key in INTERVAL_KEYS:
+        interval = run.get(key)
+        if interval is None:
+            continue
+        if isinstance(interval, (list, tuple)) and len(interval) == 2:
+            return float(interval[0]), float(interval[1])
+        if isinstance(interval, (int, float)) and time is not None:
+            return time - interval, time + interval
+    return np.nan, np.nan
+
+def _law_parameter(runs: List[Dict[str, Any]], key: str):
+    values = [run.get(key, 0) for run in runs]
+    valid = np.array([value is not None and value != -1 for value in values], dtype=bool)
+    parameter = np.array([value if is_valid else 0.0 for value, is_valid in zip(values, valid)], dtype=float)
+    return parameter, valid
+
+def _predict(runs: List[Dict[str, Any]], sequential_runs: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    threads = np.array([run["thread"] for run in runs], dtype=float)
+    actual = np.array([run["acceleration"] for run in runs], dtype=float)
+    p_amdahl, amdahl_valid = _law_parameter(runs, "amdahl_p")
+    p_gustavson, gustavson_valid = _law_parameter(runs, "gustavson_p")
+
+    bounds = np.array([_time_bounds(run) for run in runs], dtype=float).reshape(-1, 2)
+    sequential_bounds = np.array([_time_bounds(run) for run in sequential_runs], dtype=float).reshape(-1, 2)
+    sequential_time = np.array([run.get("time", np.nan) for run in sequential_runs], dtype=float)
+    sequential_bounds = np.where(np.isnan(sequential_bounds), sequential_time[:, None], sequential_bounds)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        amdahl = 1 / ((1 - p_amdahl) + (p_amdahl / threads))
+        gustavson = threads + (1 - threads) * p_gustavson
+        use_gustavson = gustavson_valid & (p_gustavson > 0.9)
+        expected = np.where(use_gustavson, gustavson, amdahl)
+        efficiency = (actual / expected) * 100
+        acceleration_low = sequential_bounds[:, 0] / bounds[:, 1]
+        acceleration_high = sequential_bounds[:, 1] / bounds[:, 0]
+        karp_flatt = (1 / actual - 1 / threads) / (1 - 1 / threads)
+
+    return {
+        "amdahl": amdahl,
+        "amdahl_valid": amdahl_valid,
+        "gustavson": gustavson,
+        "gustavson_valid": gustavson_valid,
+        "use_gustavson": use_gustavson,
+        "has_expected": use_gustavson | amdahl_valid,
+        "efficiency": efficiency,
+        "efficiency_low": acceleration_low / expected * 100,
+        "efficiency_high": acceleration_high / expected * 100,
+        "karp_flatt": karp_flatt,
+        "efficiency_per_core": actual / threads * 100,
+    }
+
+def _r2(observed: np.ndarray, predicted: np.ndarray):
+    residual = np.sum((observed - predicted) ** 2)
+    total = np.sum((observed - observed.mean()) ** 2)
+    if total == 0:
+        return None
+    return round(float(1 - residual / total), 4)
+
+def _fit_scaling_laws(runs: List[Dict[str, Any]]):
+    threads = np.array([run["thread"] for run in runs], dtype=float)
+    actual = np.array([run["acceleration"] for run in runs], dtype=float)
+    mask = (threads > 1) & np.isfinite(actual) & (actual > 0)
+    if not mask.any():
+        return None
+    threads, actual = threads[mask], actual[mask]
+
+    x = 1 - 1 / threads
+    parallel_fraction = float(np.clip(np.sum(x * (1 - 1 / actual)) / np.sum(x ** 2), 0, 1))
+    amdahl = 1 / ((1 - parallel_fraction) + parallel_fraction / threads)
+
+    scale = threads - 1
+    serial_fraction = float(np.clip(np.sum(scale * (threads - actual)) / np.sum(scale ** 2), 0, 1))
+    gustavson = threads - scale * serial_fraction
+
+    return {
+        "amdahl_fit": {
+            "parallel_fraction": round(parallel_fraction, 4),
+            "max_acceleration": round(1 / (1 - parallel_fraction), 2) if parallel_fraction < 1 else None,
+            "r2": _r2(actual, amdahl)
+        },
+        "gustavson_fit": {
+            "serial_fraction": round(serial_fraction, 4),
+            "r2": _r2(actual, gustavson)
+        }
+    }
+
+def _apply_scaling_metrics(run: Dict[str, Any], metrics: Dict[str, np.ndarray], index: int):
+    karp_flatt = float(metrics["karp_flatt"][index])
+    if np.isfinite(karp_flatt):
+        run["karp_flatt"] = round(karp_flatt, 4)
+    efficiency_per_core = float(metrics["efficiency_per_core"][index])
+    if np.isfinite(efficiency_per_core):
+        run["efficiency_per_core"] = round(efficiency_per_core, 1)
+
+def _apply_prediction(run: Dict[str, Any], metrics: Dict[str, np.ndarray], index: int, comments: List[str]):
+    if metrics["amdahl_valid"][index]:
+        run["amdahl_acceleration"] = round(float(metrics["amdahl"][index]), 2)
+        run.pop("amdahl_p", None)
+
+    if metrics["gustavson_valid"][index]:
+        gustavson_acceleration = float(metrics["gustavson"][index])
+        if isinstance(run["thread"], int) and isinstance(run.get("gustavson_p", 0), int):
+            gustavson_acceleration = int(gustavson_acceleration)
+        run["gustavson_acceleration"] = round(gustavson_acceleration, 2)
+        run.pop("gustavson_p", None)
+
+    if not metrics["has_expected"][index]:
+        return
+
+    efficiency = float(metrics["efficiency"][index])
+    run["efficiency"] = round(efficiency, 1)
+
+    efficiency_low = float(metrics["efficiency_low"][index])
+    efficiency_high = float(metrics["efficiency_high"][index])
+    has_interval = np.isfinite(efficiency_low) and np.isfinite(efficiency_high)
+    if has_interval:
+        run["efficiency_interval"] = [round(efficiency_low, 1), round(efficiency_high, 1)]
+
+    if metrics["use_gustavson"][index]:
+        task_type = "масштабируемая (Густавсон-Барсис)"
+        theory_law = "Густавсона-Барсиса"
+        theory_acceleration = float(metrics["gustavson"][index])
+    else:
+        task_type = "фиксированная (Амдал)"
+        theory_law = "Амдала"
+        theory_acceleration = float(metrics["amdahl"][index])
+
+    comment_parts = [
+        f"Для {run['thread']} потоков:",
+        f"Фактическое ускорение: {run['acceleration']:.2f}x",
+        f"Ожидаемое по закону {theory_law}: {theory_acceleration:.2f}x",
+        f"Эффективность: {efficiency:.1f}%",
+        f"Тип задачи: {task_type}"
+    ]
+
+    if has_interval:
+        comment_parts.append(f"Доверительный интервал эффективности: [{efficiency_low:.1f}%; {efficiency_high:.1f}%]")
+
+    if efficiency < 80:
+        if has_interval and efficiency_high >= 80:
+            diagnosis = "В ПРЕДЕЛАХ ПОГРЕШНОСТИ - отклонение от теории не подтверждается доверительным интервалом"
+        elif efficiency < 50:
+            diagnosis = "СИЛЬНОЕ НЕСООТВЕТСТВИЕ - возможны проблемы синхронизации или нагрузка на общие ресурсы"
+        else:
+            diagnosis = "УМЕРЕННОЕ НЕСООТВЕТСТВИЕ - возможны накладные расходы параллелизации"
+        comment_parts.append(f"Диагноз: {diagnosis}")
+
+    comments.append(" | ".join(comment_parts))
+
+def _analyze_dataset(dataset: Dict[str, Any]) -> Dict[str, Any]:
+    analyzed_dataset = dataset.copy()
+    items = []
+    parallel_runs = []
+    sequential_runs = []
+
+    for item in dataset["data"]:
+        performance_data = item["performance"]
+        sequential_run = next((run for run in performance_data if run["thread"] == 1), None)
+        if not sequential_run:
+            continue
+        runs = [run for run in performance_data if run["thread"] != 1]
+        items.append((item.copy(), runs))
+        parallel_runs.extend(runs)
+        sequential_runs.extend([sequential_run] * len(runs))
+
+    metrics = _predict(parallel_runs, sequential_runs) if parallel_runs else None
+    dataset_comments = []
+    analyzed_data = []
+    index = 0
+
+    for analyzed_item, runs in items:
+        scaling = _fit_scaling_laws(runs)
+        for run in runs:
+            _apply_prediction(run, metrics, index, dataset_comments)
+            _apply_scaling_metrics(run, metrics, index)
+            index += 1
+
+        if scaling:
+            analyzed_item["scaling"] = scaling
+
+        if not dataset_comments:
+            analyzed_item["analysis"] = GOOD_EFFICIENCY_ANALYSIS
+        else:
+            analyzed_item["analysis"] = "\n".join(dataset_comments)
+
+        analyzed_data.append(analyzed_item)
+
+    analyzed_dataset["data"] = analyzed_data
+    return analyzed_dataset
+
+def analyze_parallel_performance(input_data: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
     results = []
     global_comments = []
 
     for dataset in input_data:
-        analyzed_dataset = dataset.copy()
-        analyzed_data = []
-        dataset_comments = []
-        
-        for item in dataset["data"]:
-            analyzed_item = item.copy()
-            performance_data = item["performance"]
-            sequential_run = next((run for run in performance_data if run["thread"] == 1), None)
-            
-            if not sequential_run:
-                continue
-            
-            sequential_time = sequential_run["time"]
-            analysis_entries = []
-            
-            for run in performance_data:
-                if run["thread"] == 1:
-                    continue
-                
-                p_amdahl = run.get("amdahl_p", 0)
-                p_gustavson = run.get("gustavson_p", 0)
-                
-                amdahl_acceleration = None
-                gustavson_acceleration = None
-                
-                if p_amdahl is not None and p_amdahl != -1:
-                    amdahl_acceleration = 1 / ((1 - p_amdahl) + (p_amdahl/run["thread"]))
-                    run["amdahl_acceleration"] = round(amdahl_acceleration, 2)
-                    if "amdahl_p" in run:
-                        del run["amdahl_p"]
-                
-                if p_gustavson is not None and p_gustavson != -1:
-                    gustavson_acceleration = run["thread"] + (1 - run["thread"]) * p_gustavson
-                    run["gustavson_acceleration"] = round(gustavson_acceleration, 2)
-                    if "gustavson_p" in run:
-                        del run["gustavson_p"]
-                
-                actual_acceleration = run["acceleration"]
-                
-                expected_acceleration = None
-                if p_gustavson is not None and p_gustavson != -1 and p_gustavson > 0.9:
-                    expected_acceleration = gustavson_acceleration
-                elif p_amdahl is not None and p_amdahl != -1:
-                    expected_acceleration = amdahl_acceleration
-                
-                if expected_acceleration is not None:
-                    efficiency = (actual_acceleration / expected_acceleration) * 100
-                    run["efficiency"] = round(efficiency, 1) if round(efficiency, 1) is not None else 0
-
-                    task_type = "масштабируемая (Густавсон-Барсис)" if (p_gustavson is not None and p_gustavson != -1 and p_gustavson > 0.9) else "фиксированная (Амдал)"
-                    theory_law = "Густавсона-Барсиса" if (p_gustavson is not None and p_gustavson != -1 and p_gustavson > 0.9) else "Амдала"
-                    theory_acceleration = gustavson_acceleration if (p_gustavson is not None and p_gustavson != -1 and p_gustavson > 0.9) else amdahl_acceleration
-                    
-                    comment_parts = [
-                        f"Для {run['thread']} потоков:",
-                        f"Фактическое ускорение: {actual_acceleration:.2f}x",
-                        f"Ожидаемое по закону {theory_law}: {theory_acceleration:.2f}x",
-                        f"Эффективность: {efficiency:.1f}%",
-                        f"Тип задачи: {task_type}"
-                    ]
-                    
-                    if efficiency < 80:
-                        if efficiency < 50:
-                            diagnosis = "СИЛЬНОЕ НЕСООТВЕТСТВИЕ - возможны проблемы синхронизации или нагрузка на общие ресурсы"
-                        else:
-                            diagnosis = "УМЕРЕННОЕ НЕСООТВЕТСТВИЕ - возможны накладные расходы параллелизации"
-                        comment_parts.append(f"Диагноз: {diagnosis}")
-                    
-                    dataset_comments.append(" | ".join(comment_parts))
-            
-            if not dataset_comments:
-                analyzed_item["analysis"] = "Параллельная реализация показывает хорошую эффективность (>80%) во всех тестах"
-            else:
-                analyzed_item["analysis"] = "\n".join(dataset_comments)
-            
-            analyzed_data.append(analyzed_item)
-        
+        analyzed_dataset = _analyze_dataset(dataset)
+        analyzed_data = analyzed_dataset["data"]
+
         effective_tests = sum(1 for item in analyzed_data if "хорошую эффективность" in item.get("analysis", ""))
         total_tests = len(analyzed_data)
-        
+
         if effective_tests == total_tests:
             global_comments.append(
                 f"Все {total_tests} тестов в '{dataset.get('title', '')}' успешны "
@@ -97,14 +224,19 @@ def analyze_parallel_performance(input_data: List[Dict[str, Any]]) -> List[Dict[
                 f"В '{dataset.get('title', '')}' проблемы в {issues} из {total_tests} тестов: "
                 f"эффективность ниже 80% для {issues} конфигураций потоков"
             )
-        
-        analyzed_dataset["data"] = analyzed_data
+
         results.append(analyzed_dataset)
-    
+
     if results:
         output = {
             "results": results,
             "global_analysis": "\n".join(global_comments)
         }
         return output
-    return results
\ No newline at end of file
+    return results
+
+def analyze_result_file(file_path: str):
+    with open(file_path, 'rb') as f:
+        if ijson is None:
+            return analyze_parallel_performance(json.load(f))
+        return analyze_parallel_performance(ijson.items(f, "item", use_float=True))
@@ -0,0 +1,99 @@
+import os
+import time
+import uuid
+import hashlib
+import threading
+import subprocess
+from src.config import settings
+from src.system_info import get_compiler_info
+from src.test_generator import DATA_TYPES, BASE_INCLUDES, include_type
+from src.process_engine import child_command
+import src.cpu_reservation as cpu_reservation
+
+lock = threading.Lock()
+failed_builds = {}
+
+def detect_type(code: str):
+    lines = {line.strip() for line in code.splitlines() if line.strip().startswith("#include")}
+    for data_type in DATA_TYPES:
+        if include_type(data_type) in lines:
+            return data_type
+    return None
+
+def _pch_dir(flags: list):
+    digest = hashlib.sha256(f"{get_compiler_info()}\0{' '.join(flags)}".encode()).hexdigest()
+    return os.path.join(os.getcwd(), ".data", ".cache", "pch", digest[:16])
+
+def read_deps(dep_filename: str):
+    with open(dep_filename, 'r') as f:
+        content = f.read().replace("\\\n", " ")
+    _, _, deps = content.partition(":")
+    return deps.split()
+
+def _is_fresh(gch_filename: str, dep_filename: str):
+    try:
+        gch_mtime = os.stat(gch_filename).st_mtime
+        for dep in read_deps(dep_filename):
+            if os.stat(dep).st_mtime > gch_mtime:
+                return False
+    except OSError:
+        return False
+    return True
+
+def _build(header: str, gch_filename: str, dep_filename: str, data_type: str, flags: list):
+    with open(header, 'w') as f:
+        f.write("\n".join(BASE_INCLUDES + [include_type(data_type)]) + "\n")
+
+    suffix = uuid.uuid4().hex
+    tmp_gch = f"{gch_filename}.{suffix}.tmp"
+    tmp_dep = f"{dep_filename}.{suffix}.tmp"
+    command = [
+        "g++", *flags,
+        "-x", "c++-header", header,
+        "-o", tmp_gch,
+        "-MD", "-MF", tmp_dep,
+    ]
+    try:
+        command = child_command(command, cpu_reservation.general_cpus())
+        result = subprocess.run(command, capture_output=True, text=True, timeout=settings.pch_build_timeout)
+        if result.returncode != 0:
+            return False
+        os.replace(tmp_dep, dep_filename)
+        os.replace(tmp_gch, gch_filename)
+        return True
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    finally:
+        for tmp in (tmp_gch, tmp_dep):
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+def get_pch_flags(code: str, flags: list):
+    if not settings.pch_enabled:
+        return []
+    data_type = detect_type(code)
+    if data_type is None:
+        return []
+
+    pch_dir = _pch_dir(flags)
+    header = os.path.join(pch_dir, f"{data_type}.h")
+    gch_filename = f"{header}.gch"
+    dep_filename = f"{header}.d"
+
+    with lock:
+        if not _is_fresh(gch_filename, dep_filename):
+            if time.time() - failed_builds.get(gch_filename, 0) < settings.pch_retry_interval:
+                return []
+            os.makedirs(pch_dir, exist_ok=True)
+            if not _build(header, gch_filename, dep_filename, data_type, flags):
+                failed_builds[gch_filename] = time.time()
+                return []
+            failed_builds.pop(gch_filename, None)
+
+    return ["-include", header, "-Winvalid-pch"]
+
+def is_pch_error(pch_flags: list, stderr: str):
+    if not pch_flags:
+        return False
+    header = pch_flags[pch_flags.index("-include") + 1]
+    return header in stderr or ".gch" in stderr
@@ -0,0 +1,101 @@
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+
+EVENTS = ("cycles", "instructions", "cache-misses", "cache-references", "context-switches", "cpu-migrations")
+
+MEMORY_BOUND_MPKI = 10
+MEMORY_BOUND_IPC = 0.7
+HIGH_MISS_RATE = 0.3
+CONTEXT_SWITCHES_PER_SECOND = 1000
+MIGRATIONS_PER_SECOND = 100
+
+@lru_cache(maxsize=None)
+def available():
+    if shutil.which("perf") is None:
+        return False
+    try:
+        result = subprocess.run(
+            ["perf", "stat", "-x,", "-e", "instructions", "--", "true"],
+            capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0 and "<not supported>" not in result.stderr and "<not counted>" not in result.stderr
+
+def wrap(command: list, output_filename: str):
+    return ["perf", "stat", "-x,", "-o", output_filename, "-e", ",".join(EVENTS), "--", *command]
+
+def parse(output_filename: str):
+    counters = {event: None for event in EVENTS}
+    try:
+        with open(output_filename) as f:
+            lines = f.readlines()
+    except OSError:
+        return counters
+    for line in lines:
+        fields = line.strip().split(",")
+        if len(fields) < 3 or line.startswith("#"):
+            continue
+        value, event = fields[0], fields[2].split(":")[0]
+        if event not in counters:
+            continue
+        try:
+            counters[event] = int(float(value))
+        except ValueError:
+            counters[event] = None
+    return counters
+
+def _ratio(numerator, denominator, scale: float = 1):
+    if numerator is None or not denominator:
+        return None
+    return numerator / denominator * scale
+
+def derive(counters: dict, elapsed: float):
+    metrics = {
+        "ipc": _ratio(counters["instructions"], counters["cycles"]),
+        "cache_miss_rate": _ratio(counters["cache-misses"], counters["cache-references"]),
+        "mpki": _ratio(counters["cache-misses"], counters["instructions"], 1000),
+        "context_switches_per_second": _ratio(counters["context-switches"], elapsed),
+        "migrations_per_second": _ratio(counters["cpu-migrations"], elapsed),
+    }
+    return {key: round(value, 4) if value is not None else None for key, value in metrics.items()}
+
+def diagnose(metrics: dict):
+    diagnoses = []
+    ipc, mpki, miss_rate = metrics["ipc"], metrics["mpki"], metrics["cache_miss_rate"]
+    if mpki is not None and ipc is not None and mpki > MEMORY_BOUND_MPKI and ipc < MEMORY_BOUND_IPC:
+        diagnoses.append(
+            f"НАСЫЩЕНИЕ ПАМЯТИ - {mpki:.1f} промахов кеша на 1000 инструкций при IPC {ipc:.2f}: "
+            f"производительность ограничена пропускной способностью памяти"
+        )
+    elif miss_rate is not None and miss_rate > HIGH_MISS_RATE:
+        diagnoses.append(
+            f"ВЫСОКАЯ ДОЛЯ ПРОМАХОВ КЕША - {miss_rate * 100:.0f}% обращений к кешу промахиваются: "
+            f"проверьте порядок обхода данных и объем рабочего набора"
+        )
+    switches = metrics["context_switches_per_second"]
+    if switches is not None and switches > CONTEXT_SWITCHES_PER_SECOND:
+        diagnoses.append(
+            f"ЧАСТЫЕ ПЕРЕКЛЮЧЕНИЯ КОНТЕКСТА - {switches:.0f}/с: "
+            f"блокирующая синхронизация или потоков больше, чем ядер"
+        )
+    migrations = metrics["migrations_per_second"]
+    if migrations is not None and migrations > MIGRATIONS_PER_SECOND:
+        diagnoses.append(
+            f"МИГРАЦИИ ПОТОКОВ - {migrations:.0f}/с: потоки перемещаются между ядрами, используйте OMP_PROC_BIND"
+        )
+    return diagnoses
+
+def collect(output_filename: str, elapsed: float):
+    counters = parse(output_filename)
+    if os.path.exists(output_filename):
+        os.unlink(output_filename)
+    metrics = derive(counters, elapsed)
+    return {
+        "available": True,
+        "counters": counters,
+        "metrics": metrics,
+        "diagnoses": diagnose(metrics)
+    }
@@ -0,0 +1,318 @@
+import asyncio
+import os
+import json
+import uuid
+import signal
+import subprocess
+import threading
+from collections import defaultdict
+from redis.asyncio import Redis as AsyncRedis
+from src.config import settings
+from src.dependencies import redis_client
+from src.sandbox import resource_usage, has_tool
+
+PIPE_CHUNK_SIZE = 64 * 1024
+PIPE_DRAIN_TIMEOUT = 1
+CANCEL_CHANNEL = "process_cancel"
+
+
+class OutputBuffer:
+    def __init__(self, name: str, limit: int, output=None):
+        self.name = name
+        self.limit = limit
+        self.output = output
+        self.chunks = []
+        self.size = 0
+        self.truncated = False
+
+    def append(self, data: bytes):
+        if self.output is not None:
+            self.output.write(self.name, data)
+        allowed = self.limit - self.size
+        if allowed < len(data):
+            self.truncated = True
+            data = data[:max(allowed, 0)]
+        if data:
+            self.chunks.append(data)
+            self.size += len(data)
+
+
+def child_command(command: list, cpus: list = None, sandbox=None):
+    prefix = sandbox.command() if sandbox is not None else []
+    if cpus and has_tool("taskset"):
+        prefix += ["taskset", "-c", ",".join(map(str, cpus))]
+    return prefix + command
+
+
+def apply_limits(pid: int, cpus: list = None, sandbox=None):
+    if cpus and not has_tool("taskset"):
+        os.sched_setaffinity(pid, cpus)
+    if sandbox is not None:
+        sandbox.apply(pid)
+
+
+def _decode(chunks: list):
+    text = b"".join(chunks).decode("utf-8", errors="replace")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+class ProcessEngine:
+    def __init__(self):
+        self.processes = defaultdict(dict)
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self.processes.clear()
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="process-engine",
+                    daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+                asyncio.run_coroutine_threadsafe(self._listen_cancels(), self._loop)
+        return self._loop
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    def run(self, command: list, file_id: str, timeout: int = 30, input_data: str = None, cwd: str = None, output=None,
+            cpus: list = None, env: dict = None, sandbox=None, launch=None):
+        return self.submit(self._run(command, file_id, timeout, input_data, cwd, output, cpus, env, sandbox, launch))
+
+    def cancel(self, file_id: str):
+        return self.submit(self._cancel(file_id))
+
+    def _watch_exit(self, process: subprocess.Popen, exited: asyncio.Future):
+        loop = asyncio.get_running_loop()
+
+        def reap():
+            try:
+                _, status, rusage = os.wait4(process.pid, 0)
+            except ChildProcessError:
+                process.returncode = -1
+                return None
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return rusage
+
+        def on_reaped(future):
+            if not exited.done():
+                exited.set_result(future.result())
+
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except (AttributeError, OSError):
+            loop.run_in_executor(None, reap).add_done_callback(
+                lambda f: loop.call_soon_threadsafe(on_reaped, f)
+            )
+            return
+
+        def on_exit():
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+            exited.set_result(reap())
+
+        loop.add_reader(pidfd, on_exit)
+
+    def _read_pipe(self, pipe, on_chunk):
+        loop = asyncio.get_running_loop()
+        closed = loop.create_future()
+        fd = pipe.fileno()
+        os.set_blocking(fd, False)
+
+        def on_readable():
+            try:
+                data = os.read(fd, PIPE_CHUNK_SIZE)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            if data:
+                on_chunk(data)
+                return
+            loop.remove_reader(fd)
+            pipe.close()
+            if not closed.done():
+                closed.set_result(None)
+
+        loop.add_reader(fd, on_readable)
+        return closed
+
+    def _close_pipe(self, pipe):
+        loop = asyncio.get_running_loop()
+        if pipe.closed:
+            return
+        loop.remove_reader(pipe.fileno())
+        pipe.close()
+
+    def _write_pipe(self, pipe, data: bytes):
+        loop = asyncio.get_running_loop()
+        if not data:
+            pipe.close()
+            return
+        fd = pipe.fileno()
+        os.set_blocking(fd, False)
+        view = memoryview(data)
+
+        def on_writable():
+            nonlocal view
+            try:
+                written = os.write(fd, view[:PIPE_CHUNK_SIZE])
+                view = view[written:]
+            except BlockingIOError:
+                return
+            except OSError:
+                view = view[:0]
+            if not view:
+                loop.remove_writer(fd)
+                pipe.close()
+
+        loop.add_writer(fd, on_writable)
+
+    async def _spawn(self, command: list, cwd: str, cpus: list, env: dict, sandbox):
+        loop = asyncio.get_running_loop()
+        if sandbox is not None:
+            await loop.run_in_executor(None, sandbox.open)
+        try:
+            process = subprocess.Popen(
+                child_command(command, cpus, sandbox),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                stdin=subprocess.PIPE,
+                cwd=cwd,
+                env={**os.environ, **env} if env else None
+            )
+            apply_limits(process.pid, cpus, sandbox)
+            return process
+        except Exception:
+            if sandbox is not None:
+                await loop.run_in_executor(None, sandbox.close, None, -1)
+            raise
+
+    async def _run(self, command: list, file_id: str, timeout: int, input_data: str, cwd: str, output=None,
+                   cpus: list = None, env: dict = None, sandbox=None, launch=None):
+        loop = asyncio.get_running_loop()
+        stdout = OutputBuffer("stdout", settings.output_max_bytes, output)
+        stderr = OutputBuffer("stderr", settings.output_max_bytes, output)
+        if output is not None:
+            await output.open()
+        if launch is not None:
+            process = await loop.run_in_executor(None, launch.start)
+            sandbox = launch.sandbox
+            loop.run_in_executor(None, launch.refill)
+        else:
+            process = await self._spawn(command, cwd, cpus, env, sandbox)
+        exited = loop.create_future()
+        self.processes[file_id] = {'process': process, 'exited': exited}
+
+        try:
+            self._watch_exit(process, exited)
+            pipes_closed = [
+                self._read_pipe(process.stdout, stdout.append),
+                self._read_pipe(process.stderr, stderr.append),
+            ]
+            self._write_pipe(process.stdin, input_data.encode() if input_data else b"")
+
+            timed_out = False
+            try:
+                rusage = await asyncio.wait_for(asyncio.shield(exited), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                self._signal(process, signal.SIGKILL)
+                rusage = await exited
+
+            _, pending = await asyncio.wait(pipes_closed, timeout=PIPE_DRAIN_TIMEOUT)
+            if pending:
+                self._close_pipe(process.stdout)
+                self._close_pipe(process.stderr)
+            if not process.stdin.closed:
+                loop.remove_writer(process.stdin.fileno())
+                process.stdin.close()
+        finally:
+            if self.processes.get(file_id, {}).get('process') is process:
+                del self.processes[file_id]
+            if launch is not None:
+                launch.finish()
+
+        return_code = -1 if timed_out else process.returncode
+        if sandbox is not None:
+            resources = await loop.run_in_executor(None, sandbox.close, rusage, process.returncode)
+        else:
+            resources = resource_usage(rusage)
+        if output is not None:
+            await output.close(return_code)
+
+        return {
+            "return_code": return_code,
+            "stdout": _decode(stdout.chunks),
+            "stderr": _decode(stderr.chunks),
+            "rusage": rusage,
+            "resources": resources,
+            "timed_out": timed_out,
+            "truncated": stdout.truncated or stderr.truncated
+        }
+
+    def _signal(self, process: subprocess.Popen, signum: int):
+        if process.returncode is None:
+            try:
+                os.kill(process.pid, signum)
+            except ProcessLookupError:
+                pass
+
+    async def _cancel(self, file_id: str):
+        entry = self.processes.get(file_id)
+        if not entry or not entry.get('process'):
+            return False
+        process, exited = entry['process'], entry['exited']
+        self._signal(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(asyncio.shield(exited), 1)
+        except asyncio.TimeoutError:
+            self._signal(process, signal.SIGKILL)
+            try:
+                await asyncio.wait_for(asyncio.shield(exited), settings.cancel_ack_timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def _handle_cancel(self, client, data: bytes):
+        request = json.loads(data)
+        if request["file_id"] not in self.processes:
+            return
+        if await self._cancel(request["file_id"]):
+            pipe = client.pipeline()
+            pipe.rpush(request["reply"], 1)
+            pipe.expire(request["reply"], settings.cancel_ack_timeout * 2)
+            await pipe.execute()
+
+    async def _listen_cancels(self):
+        while True:
+            client = AsyncRedis(host=settings.redis_host, port=settings.redis_port, db=settings.redis_db)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(CANCEL_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            asyncio.create_task(self._handle_cancel(client, message["data"]))
+            except Exception as e:
+                print(f"Ошибка подписки на канал отмены: {e}")
+            finally:
+                await client.aclose()
+            await asyncio.sleep(1)
+
+
+def request_cancel(file_id: str):
+    reply = f"{CANCEL_CHANNEL}:{uuid.uuid4().hex}"
+    message = json.dumps({"file_id": file_id, "reply": reply})
+    if not redis_client.publish(CANCEL_CHANNEL, message):
+        return False
+    return redis_client.blpop([reply], timeout=settings.cancel_ack_timeout + 2) is not None
+
+
+engine = ProcessEngine()
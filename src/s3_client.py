@@ -1,7 +1,34 @@
 import boto3
 from fastapi import HTTPException
 from botocore.client import Config
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
 import os
+import uuid
+import hashlib
+import tarfile
+from src.config import settings
+from src.file_cache import FileCache, clone_or_copy
+
+data_cache = FileCache(
+    os.path.join(os.getcwd(), ".data", ".cache", "s3"),
+    settings.s3_cache_max_bytes
+)
+
+SOURCE_ATTR = "user.s3_source"
+
+def _is_fresh(file_path: str, source: str):
+    try:
+        stat = os.stat(file_path)
+        return os.getxattr(file_path, SOURCE_ATTR).decode() == f"{source}:{stat.st_mtime_ns}"
+    except OSError:
+        return False
+
+def _mark_fresh(file_path: str, source: str):
+    try:
+        os.setxattr(file_path, SOURCE_ATTR, f"{source}:{os.stat(file_path).st_mtime_ns}".encode())
+    except OSError:
+        pass
 
 class S3Client:
     def __init__(self):
@@ -12,7 +39,14 @@ class S3Client:
             endpoint_url=self.endpoint,
             aws_access_key_id=os.getenv("S3_ACCESS_KEY"),
             aws_secret_access_key=os.getenv("S3_SECRET_KEY"),
-            config=Config(signature_version='s3v4')
+            config=Config(
+                signature_version='s3v4',
+                max_pool_connections=max(
+                    10,
+                    settings.s3_download_workers,
+                    settings.s3_upload_workers * settings.s3_multipart_concurrency
+                )
+            )
         )
         self._ensure_buckets_exist()
 
@@ -22,29 +56,86 @@ class S3Client:
         except:
             self.client.create_bucket(Bucket=self.bucket)
 
-    def upload_proc_files(self, user_id: str, results: dict):
+    def _pack_dir(self, dirname: str, filenames: list):
+        archive_path = os.path.join(os.path.dirname(dirname), f".{uuid.uuid4().hex}.tar")
+        with tarfile.open(archive_path, "w") as archive:
+            for filename in filenames:
+                archive.add(os.path.join(dirname, filename), arcname=filename)
+        return archive_path
+
+    def snapshot_proc_files(self, user_id: str, results: list):
+        root = os.path.join(os.getcwd(), '.data', f"{user_id}")
+        snapshot = os.path.join(root, '.uploads', uuid.uuid4().hex)
+        for res in results:
+            dirname = os.path.join(root, res["dir"])
+            if not os.path.exists(dirname):
+                continue
+            target = os.path.join(snapshot, res["dir"])
+            os.makedirs(target, exist_ok=True)
+            for filename in os.listdir(dirname):
+                filepath = os.path.join(dirname, filename)
+                if filename != 'result.json' and os.path.isfile(filepath):
+                    clone_or_copy(filepath, os.path.join(target, filename))
+        return snapshot
+
+    def upload_proc_files(self, user_id: str, results: dict, pack: bool = None, root: str = None):
+        if pack is None:
+            pack = settings.s3_pack_outputs
+        root = root or os.path.join(os.getcwd(), '.data', f"{user_id}")
+        uploads = []
+        archives = []
         try:
             for res in results:
-                dirname = os.path.join(os.getcwd(), '.data', f"{user_id}", res["dir"])
+                dirname = os.path.join(root, res["dir"])
                 if not os.path.exists(dirname):
                     continue
-                
-                for filename in os.listdir(dirname):
-                    if filename == 'result.json':
-                        continue
+
+                filenames = [
+                    filename for filename in os.listdir(dirname)
+                    if filename != 'result.json' and os.path.isfile(os.path.join(dirname, filename))
+                ]
+                if pack and len(filenames) >= settings.s3_pack_min_files:
+                    archive_path = self._pack_dir(dirname, filenames)
+                    archives.append(archive_path)
+                    uploads.append((archive_path, f"{user_id}/proc/{res['dir']}.tar"))
+                    continue
+
+                for filename in filenames:
                     filepath = os.path.join(dirname, filename)
+                    s3_key = f"{user_id}/proc/{res['dir']}/{filename}"
+                    uploads.append((filepath, s3_key))
 
-                    s3_key = f"{user_id}/proc/{res["dir"]}/{filename}"
-    
-                    self.client.upload_file(
-                        filepath,
-                        self.bucket,
-                        s3_key
-                    )
-                
+            transfer_config = TransferConfig(
+                multipart_threshold=settings.s3_multipart_threshold,
+                multipart_chunksize=settings.s3_multipart_chunksize,
+                max_concurrency=settings.s3_multipart_concurrency
+            )
+            with ThreadPoolExecutor(max_workers=settings.s3_upload_workers) as executor:
+                futures = [
+                    executor.submit(self.client.upload_file, filepath, self.bucket, s3_key, Config=transfer_config)
+                    for filepath, s3_key in uploads
+                ]
+                for future in futures:
+                    future.result()
+
+            return {"uploaded": len(uploads), "packed": len(archives)}
         except Exception as e:
             raise HTTPException(500, f"Error uploading file: {e}")
+        finally:
+            for archive_path in archives:
+                if os.path.exists(archive_path):
+                    os.unlink(archive_path)
         
+    def _download_to_cache(self, s3_key: str, cache_key: str):
+        os.makedirs(data_cache.directory, exist_ok=True)
+        tmp_path = os.path.join(data_cache.directory, f"{uuid.uuid4().hex}.tmp")
+        try:
+            self.client.download_file(self.bucket, s3_key, tmp_path)
+            data_cache.put(cache_key, tmp_path, move=True)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
     def get_data_file(self, user_id: int, type: str, file_name: str):
         s3_key = f'{user_id}/{type}/{file_name}'
         dir_path = os.path.join(os.getcwd(), ".data", f"{user_id}")
@@ -52,8 +143,28 @@ class S3Client:
             os.makedirs(dir_path)
         file_path = os.path.join(dir_path, file_name)
         try:
-            self.client.download_file(self.bucket, s3_key, file_path)
+            head = self.client.head_object(Bucket=self.bucket, Key=s3_key)
+            size = head['ContentLength']
+            source = f"{head['ETag']}:{size}"
+            if _is_fresh(file_path, source):
+                return
+            cache_key = hashlib.sha256(source.encode()).hexdigest()
+            if not data_cache.copy(cache_key, file_path, size):
+                self._download_to_cache(s3_key, cache_key)
+                if not data_cache.copy(cache_key, file_path, size):
+                    self.client.download_file(self.bucket, s3_key, file_path)
+            _mark_fresh(file_path, source)
         except Exception as e:
             raise HTTPException(404, f"File not found: {e}")
-        
-        
\ No newline at end of file
+
+    def prefetch_data_files(self, user_id: int, files: list):
+        unique_files = {(file["type"], file["filename"]) for file in files}
+        if not unique_files:
+            return
+        with ThreadPoolExecutor(max_workers=settings.s3_download_workers) as executor:
+            futures = [
+                executor.submit(self.get_data_file, user_id, type, file_name)
+                for type, file_name in unique_files
+            ]
+            for future in futures:
+                future.result()
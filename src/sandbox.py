@@ -0,0 +1,149 @@
+import os
+import shutil
+import signal
+import threading
+import uuid
+import resource
+from functools import lru_cache
+from src.config import settings
+
+CPU_PERIOD = 100000
+JOIN_CGROUP = 'echo $$ > "$0" && exec "$@"'
+
+PRLIMIT_OPTIONS = {
+    resource.RLIMIT_CPU: "cpu",
+    resource.RLIMIT_FSIZE: "fsize",
+    resource.RLIMIT_AS: "as",
+}
+
+pending_cgroups = set()
+_pending_lock = threading.Lock()
+
+def _write(path: str, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+def _read_stat(path: str):
+    stats = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(' ')
+                stats[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return stats
+
+def resource_usage(rusage):
+    if rusage is None:
+        return {}
+    return {
+        "user_time": round(rusage.ru_utime, 4),
+        "system_time": round(rusage.ru_stime, 4),
+        "voluntary_context_switches": rusage.ru_nvcsw,
+        "involuntary_context_switches": rusage.ru_nivcsw,
+    }
+
+@lru_cache(maxsize=None)
+def has_tool(name: str):
+    return shutil.which(name) is not None
+
+@lru_cache(maxsize=None)
+def warn_without_cgroup():
+    print("Песочница работает без cgroup: число процессов запуска не ограничивается, пиковая память не измеряется")
+
+def reap_cgroups():
+    with _pending_lock:
+        paths = list(pending_cgroups)
+    for path in paths:
+        try:
+            os.rmdir(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        with _pending_lock:
+            pending_cgroups.discard(path)
+
+class Sandbox:
+    def __init__(self, timeout: int, cpus: list = None, limit_address_space: bool = True):
+        self.cores = len(cpus) if cpus else os.cpu_count() or 1
+        self.limit_address_space = limit_address_space
+        self.cpu_time = int(timeout * self.cores) + 1
+        self.cgroup = None
+        self.limits = []
+
+    def open(self):
+        reap_cgroups()
+        if settings.sandbox_cgroup_root:
+            path = os.path.join(settings.sandbox_cgroup_root, f"run-{uuid.uuid4().hex}")
+            try:
+                os.mkdir(path)
+                self.cgroup = path
+                _write(os.path.join(path, "memory.max"), settings.sandbox_memory_bytes)
+                _write(os.path.join(path, "memory.swap.max"), 0)
+                _write(os.path.join(path, "pids.max"), settings.sandbox_max_processes)
+                _write(os.path.join(path, "cpu.max"), f"{self.cores * CPU_PERIOD} {CPU_PERIOD}")
+            except OSError:
+                self._remove_cgroup()
+
+        self.limits = [
+            (resource.RLIMIT_CPU, (self.cpu_time, self.cpu_time + 1)),
+            (resource.RLIMIT_FSIZE, (settings.sandbox_file_size_bytes, settings.sandbox_file_size_bytes)),
+        ]
+        if self.cgroup is None and self.limit_address_space:
+            self.limits.append((resource.RLIMIT_AS, (settings.sandbox_memory_bytes, settings.sandbox_memory_bytes)))
+        if self.cgroup is None:
+            warn_without_cgroup()
+
+    def command(self):
+        prefix = []
+        if self.cgroup and has_tool("sh"):
+            prefix += ["sh", "-c", JOIN_CGROUP, os.path.join(self.cgroup, "cgroup.procs")]
+        if self.limits and has_tool("prlimit"):
+            prefix += ["prlimit", *(
+                f"--{PRLIMIT_OPTIONS[limit]}={soft}:{hard}" for limit, (soft, hard) in self.limits
+            ), "--"]
+        return prefix
+
+    def apply(self, pid: int):
+        if self.cgroup and not has_tool("sh"):
+            _write(os.path.join(self.cgroup, "cgroup.procs"), pid)
+        if not has_tool("prlimit"):
+            for limit, value in self.limits:
+                resource.prlimit(pid, limit, value)
+
+    def close(self, rusage, return_code: int):
+        usage = resource_usage(rusage)
+        if self.cgroup:
+            memory_peak = os.path.join(self.cgroup, "memory.peak")
+            if os.path.exists(memory_peak):
+                with open(memory_peak) as f:
+                    usage["memory_peak_bytes"] = int(f.read())
+            cpu = _read_stat(os.path.join(self.cgroup, "cpu.stat"))
+            if "nr_throttled" in cpu:
+                usage["cpu_throttled_periods"] = cpu["nr_throttled"]
+            events = _read_stat(os.path.join(self.cgroup, "memory.events"))
+            if events.get("oom_kill"):
+                usage["limit_exceeded"] = "memory"
+            self._remove_cgroup()
+        if "limit_exceeded" not in usage:
+            if return_code == -signal.SIGXCPU or (return_code == -signal.SIGKILL and usage.get("user_time", 0) + usage.get("system_time", 0) >= self.cpu_time):
+                usage["limit_exceeded"] = "cpu_time"
+            elif return_code == -signal.SIGXFSZ:
+                usage["limit_exceeded"] = "file_size"
+        return usage
+
+    def _remove_cgroup(self):
+        if self.cgroup is None:
+            return
+        try:
+            os.rmdir(self.cgroup)
+        except OSError:
+            try:
+                _write(os.path.join(self.cgroup, "cgroup.kill"), 1)
+            except OSError:
+                pass
+            with _pending_lock:
+                pending_cgroups.add(self.cgroup)
+        self.cgroup = None
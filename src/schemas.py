@@ -3,10 +3,16 @@ from pydantic import BaseModel
 class CompileRequest(BaseModel):
     user_id: int
     code: str
+    course_id: str = None
+    profile: str = None
+    harness: str = None
 
 class ExecuteRequest(BaseModel):
     user_id: int
     input_data: str = None
+    stream: bool = False
+    profiles: list[str] = None
+    counters: bool = False
 
 class Options(BaseModel):
     alpha: int
@@ -15,11 +21,25 @@ class Options(BaseModel):
     koefficient: int
     saveResult: int
     threads: list[int]
+    planThreads: int = 0
+    trimToBudget: int = 0
+    runTime: float = None
 
 class TestDataRequest(BaseModel):
     name: str
     type: str
-    code: str
+    code: str = ""
     files: list[str]
     options: Options
     parameters: list[dict]
+
+class Submission(BaseModel):
+    id: str
+    code: str
+
+class BatchRequest(BaseModel):
+    user_id: int
+    data: TestDataRequest
+    submissions: list[Submission]
+    profile: str = None
+    counters: bool = False
@@ -2,7 +2,13 @@ import psutil
 import cpuinfo
 import subprocess
 import platform
+import time
+import glob
+import os
+import socket
+from functools import lru_cache
 
+@lru_cache(maxsize=None)
 def get_compiler_info():
     try:
         result = subprocess.run(['gcc', '--version'], capture_output=True, text=True)
@@ -14,15 +20,120 @@ def get_compiler_info():
     return "Неизвестно"
 
 
-def get_system_info():
-    cpu_info = cpuinfo.get_cpu_info()
-    processor_name = cpu_info.get('brand_raw', 'Неизвестно')
+def parse_cpu_list(cpu_list: str):
+    cpus = []
+    for part in cpu_list.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
 
-    physical_cores = psutil.cpu_count(logical=False) or 1
+def get_numa_nodes():
+    nodes = []
+    for node_dir in sorted(glob.glob('/sys/devices/system/node/node[0-9]*')):
+        try:
+            with open(os.path.join(node_dir, 'cpulist')) as f:
+                cpus = parse_cpu_list(f.read())
+        except OSError:
+            continue
+        nodes.append({'node': int(os.path.basename(node_dir)[4:]), 'cpus': cpus})
+    return nodes
 
+def get_cpu_topology():
+    physical_cores = psutil.cpu_count(logical=False) or 1
+    logical_cores = psutil.cpu_count(logical=True) or physical_cores
     return {
-        'processor_name': processor_name,
         'physical_cores': physical_cores,
+        'logical_cores': logical_cores,
+        'numa_nodes': get_numa_nodes()
+    }
+
+OPENMP_VERSIONS = {
+    200505: "2.5",
+    200805: "3.0",
+    201107: "3.1",
+    201307: "4.0",
+    201511: "4.5",
+    201811: "5.0",
+    202011: "5.1",
+    202111: "5.2",
+}
+
+CACHE_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+@lru_cache(maxsize=None)
+def get_processor_name():
+    return cpuinfo.get_cpu_info().get('brand_raw', 'Неизвестно')
+
+@lru_cache(maxsize=None)
+def get_openmp_version():
+    try:
+        result = subprocess.run(
+            ['g++', '-fopenmp', '-dM', '-E', '-x', 'c++', '-'],
+            input="", capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[1] == '_OPENMP':
+            value = int(parts[2].rstrip('L'))
+            return {'macro': value, 'version': OPENMP_VERSIONS.get(value, 'Неизвестно')}
+    return None
+
+def _read(path: str):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def parse_cache_size(size: str):
+    if not size:
+        return None
+    unit = CACHE_SIZE_UNITS.get(size[-1].upper())
+    return int(size[:-1]) * unit if unit else int(size)
+
+@lru_cache(maxsize=None)
+def get_cache_sizes():
+    caches = {}
+    for index_dir in sorted(glob.glob('/sys/devices/system/cpu/cpu0/cache/index[0-9]*')):
+        level, type, size = (_read(os.path.join(index_dir, name)) for name in ('level', 'type', 'size'))
+        if not level or not size:
+            continue
+        suffix = {'Data': 'd', 'Instruction': 'i'}.get(type, '')
+        caches[f"L{level}{suffix}"] = parse_cache_size(size)
+    return caches
+
+def get_governor():
+    governors = {
+        _read(path) for path in glob.glob('/sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_governor')
+    }
+    governors.discard(None)
+    if not governors:
+        return None
+    return ", ".join(sorted(governors))
+
+def get_system_info():
+    topology = get_cpu_topology()
+    memory = psutil.virtual_memory()
+
+    return {
+        'hostname': socket.gethostname(),
+        'processor_name': get_processor_name(),
+        'physical_cores': topology['physical_cores'],
+        'logical_cores': topology['logical_cores'],
+        'numa_nodes': topology['numa_nodes'],
+        'cache_sizes': get_cache_sizes(),
+        'governor': get_governor(),
+        'memory_total': memory.total,
+        'memory_available': memory.available,
         'compiler': get_compiler_info(),
-        'language_version': 'C++17'
-    }
\ No newline at end of file
+        'openmp': get_openmp_version(),
+        'language_version': 'C++17',
+        'collected_at': time.time()
+    }
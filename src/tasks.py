@@ -1,15 +1,45 @@
 from celery import shared_task
-from src.dependencies import redis_client, s3_client
+from celery.exceptions import Retry
+from celery.signals import worker_process_init, worker_process_shutdown
+from src.dependencies import redis_client, s3_client, PENDING_ACK_DEADLINES
 from src.config import settings
 import httpx
 import os
+import shutil
+import time
 import uuid
+import hashlib
 import src.compiler as compiler
+import src.compile_cache as compile_cache
+import src.analyzer_client as analyzer_client
+import src.benchmark_history as benchmark_history
+import src.cpu_reservation as cpu_reservation
+import src.build_profiles as build_profiles
+import src.artifact_store as artifact_store
+import src.warm_launcher as warm_launcher
+import src.metrics as metrics
+import src.batch as batch
+import src.node_info as node_info
+from src.schemas import TestDataRequest
+from src.system_info import get_compiler_info
+from src.http_clients import open_sync_clients, close_sync_clients
+from src.file_cache import clone_or_copy
+from concurrent.futures import ThreadPoolExecutor
 from celery.utils.log import get_task_logger
 
 logger = get_task_logger(__name__)
+analyzer_executor = ThreadPoolExecutor(max_workers=settings.analyzer_workers)
+
+@worker_process_init.connect
+def init_http_clients(**kwargs):
+    open_sync_clients()
+
+@worker_process_shutdown.connect
+def shutdown_http_clients(**kwargs):
+    close_sync_clients()
 
 def _store_task_info(task_id: str, user_id: str, operation: str):
+    metrics.set_attributes(task_id=task_id, user_id=user_id, operation=operation)
     redis_client.hset(
         f"task_info:{task_id}",
         mapping={
@@ -19,121 +49,429 @@ def _store_task_info(task_id: str, user_id: str, operation: str):
     )
     redis_client.expire(f"task_info:{task_id}", 3600)
 
+def _mark_pending_ack(task_id: str, user_id: str, operation: str):
+    key = f"pending_ack:{task_id}"
+    pipe = redis_client.pipeline()
+    pipe.hset(
+        key,
+        mapping={
+            'user_id': user_id,
+            'operation': operation,
+            'extended': "0"
+        }
+    )
+    pipe.expire(key, settings.ack_timeout)
+    pipe.zadd(PENDING_ACK_DEADLINES, {task_id: time.time() + settings.ack_timeout})
+    pipe.execute()
+
+def _clear_pending_ack(task_id: str):
+    pipe = redis_client.pipeline()
+    pipe.delete(f"pending_ack:{task_id}")
+    pipe.zrem(PENDING_ACK_DEADLINES, task_id)
+    pipe.execute()
+
+def _store_binary_info(file_id: str, code: str, profile: str = None):
+    key = f"binary_info:{file_id}"
+    redis_client.hset(
+        key,
+        mapping={
+            "code_hash": hashlib.sha256(code.encode()).hexdigest(),
+            "compiler": get_compiler_info(),
+            "profile": profile or build_profiles.DEFAULT_PROFILE
+        }
+    )
+    redis_client.expire(key, settings.binary_info_ttl)
+
+def _record_history(task_id: str, user_id: str, file_id: str, bin_filename: str, result: dict):
+    try:
+        info = redis_client.hgetall(f"binary_info:{file_id}")
+        code_hash = info[b"code_hash"].decode() if info else benchmark_history.file_hash(bin_filename)
+        compiler_info = info[b"compiler"].decode() if info else get_compiler_info()
+        rows = benchmark_history.record(task_id, user_id, code_hash, compiler_info, result["result"])
+        machine = benchmark_history.machine_fingerprint()
+        regressions = []
+        for function in sorted({row["function"] for row in rows}):
+            regressions.extend(benchmark_history.detect_regressions(function, machine, user_id, code_hash))
+        if regressions:
+            result["regressions"] = regressions
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить историю измерений: {e}")
+
+def _acquire_user_slot(task, queue: str, user_id: str):
+    key = f"user_slots:{queue}:{user_id}"
+    active = redis_client.incr(key)
+    redis_client.expire(key, settings.user_slot_ttl)
+    if active > settings.user_max_active_tasks.get(queue, active):
+        redis_client.decr(key)
+        raise task.retry(
+            countdown=settings.fair_retry_countdown,
+            max_retries=None,
+            priority=settings.fair_retry_priority
+        )
+
+def _release_user_slot(queue: str, user_id: str):
+    key = f"user_slots:{queue}:{user_id}"
+    if redis_client.decr(key) <= 0:
+        redis_client.delete(key)
+
+def _profile_binary(file_id: str, user_id: str, profile: str, primary_profile: str):
+    if profile == primary_profile:
+        return build_profiles.binary_path(user_id, file_id), None
+    source = build_profiles.source_path(user_id, file_id)
+    if not os.path.exists(source):
+        return None, {"message": "Исходный код для сборки варианта не найден", "return_code": 1}
+    with open(source) as f:
+        code = f.read()
+    harness = build_profiles.harness_path(user_id, file_id)
+    bin_filename = build_profiles.binary_path(user_id, file_id, profile)
+    with metrics.stage("build"):
+        build = compile_cache.compile_with_cache(
+            code, source, bin_filename,
+            flags=build_profiles.get_flags(profile),
+            harness_filename=harness if os.path.exists(harness) else None
+        )
+    if build["return_code"] != 0:
+        return None, build
+    artifact_store.register(user_id, bin_filename)
+    return bin_filename, build
+
+def _binary_profile(file_id: str):
+    profile = redis_client.hget(f"binary_info:{file_id}", "profile")
+    return profile.decode() if profile else build_profiles.DEFAULT_PROFILE
+
+def _build_profiles(file_id: str, user_id: str, profiles: list):
+    primary_profile = _binary_profile(file_id)
+    return {
+        profile: _profile_binary(file_id, user_id, profile, primary_profile)
+        for profile in dict.fromkeys(profiles)
+    }
+
+def _benchmark_profiles(builds: dict, file_id: str, input_data: str, cpus: list, counters: bool = False):
+    runs = {}
+    results = []
+    stdout, stderr = [], []
+    return_code = 0
+
+    for profile, (bin_filename, build) in builds.items():
+        entry = {}
+        if build is not None:
+            entry["build"] = {
+                "message": build["message"],
+                "return_code": build["return_code"],
+                "cached": build.get("cached", False)
+            }
+        if bin_filename is None:
+            return_code = return_code or build["return_code"]
+            runs[profile] = entry
+            continue
+
+        run = compiler.execute_test(
+            bin_filename, file_id, input_data, cpus, profile,
+            profile not in build_profiles.UNLIMITED_ADDRESS_SPACE, counters
+        )
+        entry["return_code"] = run["return_code"]
+        entry["resources"] = run["resources"]
+        if "hardware" in run:
+            entry["hardware"] = run["hardware"]
+        runs[profile] = entry
+        results.extend(run.get("result", []))
+        stdout.append(f"=== {profile} ===\n{run['stdout']}")
+        stderr.append(f"=== {profile} ===\n{run['stderr']}")
+        return_code = return_code or run["return_code"]
+
+    result = {
+        "message": "Выполнение завершено",
+        "stdout": "\n".join(stdout),
+        "stderr": "\n".join(stderr),
+        "return_code": return_code,
+        "profiles": runs
+    }
+    if results:
+        result["result"] = results
+        result["comparison"] = build_profiles.compare(results)
+    return result
+
+def _reserve_benchmark_cpus(task):
+    if not cpu_reservation.benchmark_slots():
+        return None, None
+    slot, cpus = cpu_reservation.reserve(task.request.id)
+    if slot is None:
+        raise task.retry(countdown=settings.benchmark_slot_retry_countdown, max_retries=None)
+    return slot, cpus
+
 @shared_task(bind=True)
-def compile_task(self, code: str, user_id: str):
+def compile_task(self, code: str, user_id: str, course_id: str = None, profile: str = None, harness: str = None):
     _store_task_info(self.request.id, user_id, "compile")
+    _acquire_user_slot(self, "compile", user_id)
     if not os.path.exists(f'./.data/{user_id}'):
         os.makedirs(f'./.data/{user_id}')
     file_id = str(uuid.uuid4())
     src_filename = f"/tmp/{file_id}.cpp"
     bin_filename = f"./.data/{user_id}/{file_id}.out"
 
+    harness_filename = f"/tmp/{file_id}.harness.cpp" if harness else None
+
     with open(src_filename, 'w') as f:
         f.write(code)
+    artifact_store.register_tmp(src_filename)
+    if harness:
+        with open(harness_filename, 'w') as f:
+            f.write(harness)
+        artifact_store.register_tmp(harness_filename)
 
     try:
-        result = compiler.compile(src_filename, bin_filename)
+        analysis = analyzer_executor.submit(analyzer_client.analyze, "vars", code)
+        flags = build_profiles.get_flags(profile)
+        with metrics.stage("build"):
+            result = compile_cache.compile_with_cache(code, src_filename, bin_filename, course_id, flags, harness_filename)
+        result["profile"] = profile or build_profiles.DEFAULT_PROFILE
         
-        with httpx.Client() as client:
-            try:
-                response = client.post(
-                    settings.input_analyzer_url,
-                    json={"type": "vars", "content": code}
-                )
-                response.raise_for_status()
-                result["stdout"] = response.json()
-            except httpx.HTTPError as e:
-                raise self.retry(exp=e, countdown=5)
+        try:
+            with metrics.stage("analyzer"):
+                result["stdout"] = analysis.result()
+        except httpx.HTTPError as e:
+            raise self.retry(exp=e, countdown=5)
         if result["return_code"] == 1:
             return result
         
         strings = result["stdout"].pop("strings")
         if strings:
-            for string in strings:
-                s3_client.get_data_file(user_id, string["type"], string["filename"])
+            with metrics.stage("s3_fetch"):
+                s3_client.prefetch_data_files(user_id, strings)
+            for filename in {file["filename"] for file in strings}:
+                artifact_store.register(user_id, f"./.data/{user_id}/{filename}")
 
         result["file_id"] = file_id
+        with open(build_profiles.source_path(user_id, file_id), 'w') as f:
+            f.write(code)
+        artifacts = [bin_filename, build_profiles.source_path(user_id, file_id)]
+        if harness:
+            with open(build_profiles.harness_path(user_id, file_id), 'w') as f:
+                f.write(harness)
+            artifacts.append(build_profiles.harness_path(user_id, file_id))
+        if os.path.exists(warm_launcher.shared_library_path(bin_filename)):
+            artifacts.append(warm_launcher.shared_library_path(bin_filename))
+        for artifact in artifacts:
+            artifact_store.register(user_id, artifact)
+        _store_binary_info(file_id, f"{code}\0{harness}" if harness else code, profile)
 
-        redis_client.hset(
-            f"pending_ack:{self.request.id}",
-            mapping={
-                'user_id': user_id,
-                'operation': "compile",
-                'extended': "0"
-            }
-        )
-        redis_client.expire(f"pending_ack:{self.request.id}", 20)
+        _mark_pending_ack(self.request.id, user_id, "compile")
         return result
     except Exception as e:
-        redis_client.delete(f"pending_ack:{self.request.id}")
+        _clear_pending_ack(self.request.id)
     finally:
-        if os.path.exists(src_filename):
-            os.unlink(src_filename)
+        _release_user_slot("compile", user_id)
+        for filename in (src_filename, harness_filename):
+            if filename and os.path.exists(filename):
+                os.unlink(filename)
+            if filename:
+                artifact_store.release_tmp(filename)
     
 @shared_task(bind=True)
-def execute_task(self, file_id: str, user_id: str, input_data: str = None):
+def execute_task(self, file_id: str, user_id: str, input_data: str = None, stream: bool = False):
     _store_task_info(self.request.id, user_id, "execute")
     bin_filename = f"./.data/{user_id}/{file_id}.out"
     if not os.path.exists(bin_filename):
         raise self.retry(countdown=5)
     
+    _acquire_user_slot(self, "execute", user_id)
     try:
-        result = compiler.execute(bin_filename, file_id, input_data)
-        
-        redis_client.hset(
-            f"pending_ack:{self.request.id}",
-            mapping={
-                'user_id': user_id,
-                'operation': "execute",
-                'extended': "0"
-            }
+        stream_id = self.request.id if stream else None
+        result = compiler.execute(
+            bin_filename, file_id, input_data, stream_id, cpu_reservation.general_cpus(),
+            _binary_profile(file_id) not in build_profiles.UNLIMITED_ADDRESS_SPACE
         )
-        redis_client.expire(f"pending_ack:{self.request.id}", 20)
+        
+        _mark_pending_ack(self.request.id, user_id, "execute")
 
         return result
     except Exception as e:
-        redis_client.delete(f"pending_ack:{self.request.id}")
+        _clear_pending_ack(self.request.id)
     finally:
-        if os.path.exists(bin_filename):
-            os.utime(bin_filename)
+        _release_user_slot("execute", user_id)
+        artifact_store.touch(user_id, bin_filename)
 
 @shared_task(bind=True)
-def execute_test_task(self, file_id: str, user_id: str, input_data: str = None):
+def execute_test_task(self, file_id: str, user_id: str, input_data: str = None, profiles: list = None,
+                      counters: bool = False):
     _store_task_info(self.request.id, user_id, "test_execution")
     bin_filename = f"./.data/{user_id}/{file_id}.out"
     if not os.path.exists(bin_filename):
         raise self.retry(countdown=5)
     
+    builds = _build_profiles(file_id, user_id, profiles) if profiles else None
+    slot, cpus = _reserve_benchmark_cpus(self)
     try:
-        result = compiler.execute_test(bin_filename, file_id, input_data)
+        _acquire_user_slot(self, "benchmark", user_id)
+    except Exception:
+        cpu_reservation.release(slot, self.request.id)
+        raise
+    try:
+        if builds:
+            result = _benchmark_profiles(builds, file_id, input_data, cpus, counters)
+        else:
+            result = compiler.execute_test(
+                bin_filename, file_id, input_data, cpus,
+                limit_address_space=_binary_profile(file_id) not in build_profiles.UNLIMITED_ADDRESS_SPACE,
+                counters=counters
+            )
+        if cpus:
+            result["cpus"] = cpus
         
         if "result" in result:
-            s3_client.upload_proc_files(user_id, result["result"])
-
-        redis_client.hset(
-            f"pending_ack:{self.request.id}",
-            mapping={
-                'user_id': user_id,
-                'operation': "test_execution",
-                'extended': "0"
-            }
-        )
-        redis_client.expire(f"pending_ack:{self.request.id}", 20)
+            for res in result["result"]:
+                artifact_store.register(user_id, f"./.data/{user_id}/{res['dir']}")
+            with metrics.stage("history"):
+                _record_history(self.request.id, user_id, file_id, bin_filename, result)
+            if settings.s3_background_upload:
+                dirs = [{"dir": res["dir"]} for res in result["result"]]
+                snapshot = s3_client.snapshot_proc_files(user_id, dirs)
+                artifact_store.register(user_id, snapshot)
+                result["upload_task_id"] = upload_results_task.apply_async(
+                    args=[user_id, dirs, snapshot],
+                    queue=artifact_store.node_queue(queue="upload")
+                ).id
+            else:
+                with metrics.stage("upload"):
+                    s3_client.upload_proc_files(user_id, result["result"])
+
+        _mark_pending_ack(self.request.id, user_id, "test_execution")
         return result
     except Exception as e:
-        redis_client.delete(f"pending_ack:{self.request.id}")
+        _clear_pending_ack(self.request.id)
+    finally:
+        _release_user_slot("benchmark", user_id)
+        cpu_reservation.release(slot, self.request.id)
+        artifact_store.touch(user_id, bin_filename)
+
+@shared_task(bind=True)
+def upload_results_task(self, user_id: str, results: list, snapshot: str = None):
+    _store_task_info(self.request.id, user_id, "upload")
+    try:
+        with metrics.stage("upload"):
+            return s3_client.upload_proc_files(user_id, results, root=snapshot)
     finally:
-        if os.path.exists(bin_filename):
-            os.utime(bin_filename)
+        if snapshot:
+            artifact_store.remove(snapshot)
 
 @shared_task(bind=True)
 def cancel_task(self, file_id: str):
     result = compiler.cancel(file_id)
-    for ext in ('.cpp',):
+    for ext in ('.cpp', '.harness.cpp'):
         filename = f"/tmp/{file_id}{ext}"
         if os.path.exists(filename):
             try:
                 os.unlink(filename)
             except:
                 pass
-    return result
\ No newline at end of file
+    return result
+
+@shared_task(bind=True)
+def collect_garbage_task(self):
+    nodes = artifact_store.nodes()
+    for node in nodes:
+        collect_node_garbage_task.apply_async(queue=artifact_store.node_queue(node))
+    return nodes
+
+@shared_task(bind=True)
+def collect_node_garbage_task(self):
+    reclaimed = artifact_store.collect_garbage()
+    logger.info(
+        f"Очистка артефактов: освобождено {reclaimed['bytes']} байт, "
+        f"удалено {reclaimed['files']} артефактов и {reclaimed['tmp_files']} временных файлов"
+    )
+    return reclaimed
+
+def _copy_data_file(user_id: str, filename: str, directory: str):
+    source = os.path.abspath(f"./.data/{user_id}/{filename}")
+    target = os.path.join(directory, filename)
+    if not os.path.exists(source) or os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    clone_or_copy(source, target)
+
+@shared_task(bind=True)
+def batch_task(self, batch_id: str, user_id: str, data: dict, submissions: list, profile: str = None,
+               counters: bool = False):
+    _store_task_info(self.request.id, user_id, "batch")
+    with metrics.stage("generate"):
+        groups = batch.prepare(batch_id, TestDataRequest(**data), submissions)
+    for source, ids in groups.values():
+        batch_compile_task.delay(batch_id, user_id, source, ids, profile, counters)
+    return {"batch_id": batch_id, "unique": len(groups)}
+
+@shared_task(bind=True)
+def batch_compile_task(self, batch_id: str, user_id: str, source: str, ids: list, profile: str = None,
+                       counters: bool = False):
+    _store_task_info(self.request.id, user_id, "batch_compile")
+    file_id = str(uuid.uuid4())
+    directory = batch.run_dir(user_id, batch_id, file_id)
+    os.makedirs(directory, exist_ok=True)
+    src_filename = f"/tmp/{file_id}.cpp"
+    bin_filename = os.path.join(directory, f"{file_id}.out")
+    with open(src_filename, 'w') as f:
+        f.write(source)
+    artifact_store.register_tmp(src_filename)
+
+    try:
+        analysis = analyzer_executor.submit(analyzer_client.analyze, "vars", source)
+        with metrics.stage("build"):
+            build = compile_cache.compile_with_cache(
+                source, src_filename, bin_filename, flags=build_profiles.get_flags(profile)
+            )
+        if build["return_code"] != 0:
+            batch.record_build(batch_id, ids, build)
+            return build["return_code"]
+
+        try:
+            with metrics.stage("analyzer"):
+                strings = analysis.result().get("strings", [])
+        except httpx.HTTPError as e:
+            raise self.retry(exc=e, countdown=5)
+        if strings:
+            with metrics.stage("s3_fetch"):
+                s3_client.prefetch_data_files(user_id, strings)
+            for filename in {file["filename"] for file in strings}:
+                artifact_store.register(user_id, f"./.data/{user_id}/{filename}")
+                _copy_data_file(user_id, filename, directory)
+
+        with open(os.path.join(directory, f"{file_id}.cpp"), 'w') as f:
+            f.write(source)
+        artifact_store.register(user_id, directory)
+        batch.record_build(batch_id, ids, build, file_id)
+        batch_test_task.apply_async(
+            args=[batch_id, user_id, file_id, ids, profile, counters],
+            queue=artifact_store.node_queue(queue="benchmark")
+        )
+        return build["return_code"]
+    except Retry:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    except Exception as e:
+        batch.record_failure(batch_id, ids, getattr(e, "detail", str(e)))
+    finally:
+        if os.path.exists(src_filename):
+            os.unlink(src_filename)
+        artifact_store.release_tmp(src_filename)
+
+@shared_task(bind=True)
+def batch_test_task(self, batch_id: str, user_id: str, file_id: str, ids: list, profile: str = None,
+                    counters: bool = False):
+    _store_task_info(self.request.id, user_id, "batch_test")
+    directory = batch.run_dir(user_id, batch_id, file_id)
+    bin_filename = os.path.join(directory, f"{file_id}.out")
+
+    slot, cpus = _reserve_benchmark_cpus(self)
+    try:
+        run = compiler.execute_test(
+            bin_filename, file_id, cpus=cpus,
+            limit_address_space=profile not in build_profiles.UNLIMITED_ADDRESS_SPACE,
+            counters=counters
+        )
+        batch.record_run(batch_id, ids, file_id, run)
+        return run["return_code"]
+    except Exception as e:
+        batch.record_failure(batch_id, ids, getattr(e, "detail", str(e)))
+    finally:
+        cpu_reservation.release(slot, self.request.id)
+        artifact_store.register(user_id, directory)
@@ -1,4 +1,16 @@
+from fastapi import HTTPException
+from src.config import settings
 from src.schemas import TestDataRequest
+from src.system_info import get_cpu_topology
+import src.node_info as node_info
+
+DATA_TYPES = ('array', 'matrix', 'text', 'image', 'audio', 'video')
+
+BASE_INCLUDES = [
+    "#include <ParallelTesting/TestOptions.h>",
+    "#include <ParallelTesting/TestFunctions.h>",
+    "#include <TestingData/Data.h>",
+]
 
 def alpha(val):
     if val == 0:
@@ -69,12 +81,7 @@ def include_type(type):
         return "#include <TestingData/DataVideo.h>"
 
 def generate_includes(cpp_code, type):
-    includes_to_add = [
-        "#include <ParallelTesting/TestOptions.h>",
-        "#include <ParallelTesting/TestFunctions.h>",
-        "#include <TestingData/Data.h>",
-        include_type(type)
-    ]
+    includes_to_add = BASE_INCLUDES + [include_type(type)]
     
     existing_includes = set()
     
@@ -90,6 +97,70 @@ def generate_includes(cpp_code, type):
 
     return "\n".join(final_includes)
 
+def plan_threads(topology, max_threads: int = None):
+    physical = topology['physical_cores']
+    logical = topology['logical_cores']
+    counts = {1, physical}
+    count = 2
+    while count <= physical:
+        counts.add(count)
+        count *= 2
+    if len(topology['numa_nodes']) > 1:
+        for node in topology['numa_nodes']:
+            node_cores = len(node['cpus']) * physical // logical
+            if node_cores > 1:
+                counts.add(node_cores)
+    if max_threads:
+        counts = {count for count in counts if count <= max_threads} | {max_threads}
+    return sorted(counts)
+
+def planning_topology():
+    nodes = node_info.list_nodes("benchmark")
+    if not nodes:
+        return get_cpu_topology(), None
+    node = min(nodes, key=lambda info: info['physical_cores'])
+    slots = [info['benchmark_slot_cpus'] for info in nodes if info.get('benchmark_slot_cpus')]
+    return node, min(slots) if slots else None
+
+def estimate_time(op, threads_count, files_count, sets_count):
+    run_time = op.runTime or settings.default_run_time_estimate
+    return op.iterations * threads_count * max(files_count, 1) * max(sets_count, 1) * run_time
+
+def plan_options(data: TestDataRequest):
+    op = data.options
+    budget = settings.test_timeout
+    if not (op.planThreads or op.trimToBudget or op.runTime):
+        return op, {
+            'threads': list(op.threads),
+            'iterations': op.iterations,
+            'estimated_time': None,
+            'time_limit': budget
+        }
+
+    thread_counts = plan_threads(*planning_topology()) if op.planThreads else list(op.threads)
+    iterations = op.iterations
+
+    estimated = estimate_time(op, len(thread_counts), len(data.files), len(data.parameters))
+    if estimated > budget:
+        if not op.trimToBudget:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Ожидаемое время тестирования {estimated:.1f} с превышает лимит {budget} с"
+            )
+        while len(thread_counts) > 2 and estimated > budget:
+            thread_counts.pop()
+            estimated = estimate_time(op, len(thread_counts), len(data.files), len(data.parameters))
+        if estimated > budget:
+            iterations = max(1, int(op.iterations * budget / estimated))
+
+    options = op.model_copy(update={'threads': thread_counts, 'iterations': iterations})
+    return options, {
+        'threads': thread_counts,
+        'iterations': iterations,
+        'estimated_time': round(estimate_time(options, len(thread_counts), len(data.files), len(data.parameters)), 2),
+        'time_limit': budget
+    }
+
 def generate_main(data: TestDataRequest):
     text = "int main() {\n"
     op = data.options
@@ -126,7 +197,10 @@ def generate_main(data: TestDataRequest):
     return text
 
 def generate_data(data: TestDataRequest):
+    options, plan = plan_options(data)
+    data = data.model_copy(update={'options': options})
     return {
         "main": generate_main(data),
-        "include": generate_includes(data.code, data.type)
+        "include": generate_includes(data.code, data.type),
+        "plan": plan
     }
\ No newline at end of file
@@ -1,65 +1,143 @@
-import os
 import time
+import json
 import asyncio
 import httpx
 
 from typing import Dict, Any
+from celery import states
 from src.config import settings
-from src.dependencies import redis_client
-
-async def clean_old_files(directory: str, extension: str, max_age: int):
-    while True:
-        await asyncio.sleep(60)
-        now = time.time()
-        for filename in os.listdir(directory):
-            if filename.endswith(extension):
-                file_path = os.path.join(directory, filename)
-                if os.stat(file_path).st_mtime < now - max_age:
-                    try:
-                        os.unlink(file_path)
-                        print(f"Удален устаревший файл: {filename}")
-                    except:
-                        pass
+from src.http_clients import get_async_client
+from src.dependencies import async_redis_client, async_result_client, PENDING_ACK_DEADLINES
 
 async def send_notification(task_id: str, user_id: int, operation: str):
-    async with httpx.AsyncClient() as client:
+    await send_notifications([{
+        "task_id": task_id,
+        "text": operation,
+        "user_id": user_id
+    }])
+
+async def send_notifications(notifications: list):
+    if not notifications:
+        return
+    if settings.server_lessons_batch_url:
+        client = get_async_client(settings.server_lessons_batch_url)
         try:
-            await client.post(
-                settings.server_lessons_url,
-                json={
-                    "task_id": task_id,
-                    "text": operation,
-                    "user_id": user_id
-                }
-            )
+            await client.post(settings.server_lessons_batch_url, json=notifications)
         except httpx.HTTPError:
             pass
+        return
+
+    client = get_async_client(settings.server_lessons_url)
+    responses = await asyncio.gather(
+        *(client.post(settings.server_lessons_url, json=notification) for notification in notifications),
+        return_exceptions=True
+    )
+    for response in responses:
+        if isinstance(response, Exception) and not isinstance(response, httpx.HTTPError):
+            raise response
+
+async def _expire_pending_acks():
+    now = time.time()
+    task_ids = await async_redis_client.zrangebyscore(
+        PENDING_ACK_DEADLINES, 0, now + settings.ack_check_interval
+    )
+    if not task_ids:
+        return
+
+    pipe = async_redis_client.pipeline(transaction=False)
+    for task_id in task_ids:
+        pipe.hgetall(f"pending_ack:{task_id.decode()}")
+    records = await pipe.execute()
+
+    notifications = []
+    pipe = async_redis_client.pipeline(transaction=False)
+    for task_id, task_data in zip(task_ids, records):
+        task_id = task_id.decode()
+        key = f"pending_ack:{task_id}"
+        if not task_data:
+            pipe.zrem(PENDING_ACK_DEADLINES, task_id)
+        elif task_data.get(b"extended") != b"1":
+            notifications.append({
+                "task_id": task_id,
+                "text": task_data[b'operation'].decode(),
+                "user_id": task_data[b'user_id'].decode()
+            })
+            pipe.hset(key, "extended", "1")
+            pipe.expire(key, settings.ack_extended_timeout)
+            pipe.zadd(PENDING_ACK_DEADLINES, {task_id: now + settings.ack_extended_timeout})
+        else:
+            pipe.delete(key)
+            pipe.delete(f"task_info:{task_id}")
+            pipe.zrem(PENDING_ACK_DEADLINES, task_id)
+
+    await send_notifications(notifications)
+    await pipe.execute()
+
+async def acknowledge_task(task_id: str):
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.delete(f"pending_ack:{task_id}")
+    pipe.zrem(PENDING_ACK_DEADLINES, task_id)
+    await pipe.execute()
 
 async def check_unacknowledged_tasks():
     try:
         while True:
-            await asyncio.sleep(10)
-            for key in redis_client.scan_iter("pending_ack:*"):
-                ttl = redis_client.ttl(key)
-                task_data = redis_client.hgetall(key)
-                
-                if not task_data:
-                    continue
-                
-                if ttl <= 10:
-                    task_id = key.decode().split(":")[1]
-                    if redis_client.hget(key, "extended") != b"1":
-                        await send_notification(
-                            task_id=task_id,
-                            user_id=task_data[b'user_id'].decode(),
-                            operation=task_data[b'operation'].decode()
-                        )
-                        
-                        redis_client.hset(key, "extended", "1")
-                        redis_client.expire(key, 24 * 3600)
-                    else:
-                        redis_client.delete(key)
-                        redis_client.delete(f"task_info:{task_id}")
-                        
+            await asyncio.sleep(settings.ack_check_interval)
+            try:
+                await _expire_pending_acks()
+            except Exception as e:
+                print(f"Ошибка проверки неподтвержденных задач: {e}")
     except asyncio.CancelledError:
-        print("Проверка неподтвержденных задач остановлена")
\ No newline at end of file
+        print("Проверка неподтвержденных задач остановлена")
+
+async def get_task_meta(task_id: str):
+    stored = await async_result_client.get(f"celery-task-meta-{task_id}")
+    if not stored:
+        return {"status": states.PENDING}
+    return json.loads(stored)
+
+async def task_status_payload(task_id: str, meta: dict, ack: bool):
+    if meta["status"] != states.SUCCESS:
+        return {"status": meta["status"]}
+    if ack:
+        await acknowledge_task(task_id)
+        needs_ack = False
+    else:
+        needs_ack = bool(await async_redis_client.exists(f"pending_ack:{task_id}"))
+    return {
+        "status": meta["status"],
+        "result": meta.get("result"),
+        "requires_acknowledgment": needs_ack
+    }
+
+async def task_result_events(task_id: str, ack: bool = True):
+    key = f"celery-task-meta-{task_id}"
+    pubsub = async_result_client.pubsub()
+    await pubsub.subscribe(key)
+    try:
+        stored = await async_result_client.get(key)
+        meta = json.loads(stored) if stored else None
+        loop = asyncio.get_running_loop()
+        interval = settings.stream_block_ms / 1000
+        deadline = loop.time() + settings.task_events_timeout
+        keep_alive_at = loop.time() + interval
+        while meta is None or meta["status"] not in states.READY_STATES:
+            now = loop.time()
+            if now >= deadline:
+                yield "event: timeout\ndata: {}\n\n"
+                return
+            if now >= keep_alive_at:
+                keep_alive_at = now + interval
+                yield ": keep-alive\n\n"
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True,
+                timeout=min(interval, deadline - now)
+            )
+            if message is not None:
+                meta = json.loads(message["data"])
+
+        payload = await task_status_payload(task_id, meta, ack)
+        yield f"event: result\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    finally:
+        await pubsub.unsubscribe(key)
+        await pubsub.aclose()
\ No newline at end of file
@@ -0,0 +1,222 @@
+import os
+import time
+import hashlib
+import threading
+import subprocess
+from collections import defaultdict, deque
+from src.config import settings
+from src.dependencies import redis_client
+from src.process_engine import child_command, apply_limits
+from src.sandbox import Sandbox
+
+SOURCE = os.path.join(os.path.dirname(__file__), "launcher", "launcher.c")
+BUILD_DIR = os.path.join(os.getcwd(), ".data", ".cache", "launcher")
+STATS_KEY = "launcher:stats"
+MODES = ("cold", "warm")
+
+_build_lock = threading.Lock()
+_build_failed = {}
+
+def _launcher_key(link_flags: list):
+    digest = hashlib.sha256()
+    with open(SOURCE, 'rb') as f:
+        digest.update(f.read())
+    digest.update(" ".join(link_flags).encode())
+    return digest.hexdigest()[:16]
+
+def build_launcher(link_flags: list):
+    path = os.path.join(BUILD_DIR, f"launcher-{_launcher_key(link_flags)}")
+    if os.path.exists(path):
+        return path
+    with _build_lock:
+        if os.path.exists(path):
+            return path
+        failed_at = _build_failed.get(path)
+        if failed_at and time.time() - failed_at < settings.pch_retry_interval:
+            return None
+        os.makedirs(BUILD_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        command = [
+            "gcc", "-O2", "-fopenmp", SOURCE, "-o", tmp, "-ldl",
+            "-Wl,--no-as-needed", *link_flags
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True, timeout=settings.pch_build_timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            result = None
+        if result is None or result.returncode != 0:
+            _build_failed[path] = time.time()
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            return None
+        os.replace(tmp, path)
+        return path
+
+class Helper:
+    def __init__(self, process: subprocess.Popen, control: int, ready: int, sandbox):
+        self.process = process
+        self.control = control
+        self.ready = ready
+        self.sandbox = sandbox
+
+    def discard(self):
+        for fd in (self.control, self.ready):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        for pipe in (self.process.stdin, self.process.stdout, self.process.stderr):
+            pipe.close()
+        self.process.kill()
+        self.process.wait()
+        if self.sandbox is not None:
+            self.sandbox.close(None, -1)
+
+class WarmPool:
+    def __init__(self):
+        self.helpers = defaultdict(deque)
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def _check_fork(self):
+        if self.pid != os.getpid():
+            self.helpers = defaultdict(deque)
+            self.pid = os.getpid()
+
+    def spawn(self, launcher: str, cpus: list, timeout: int):
+        control_read, control_write = os.pipe()
+        ready_read, ready_write = os.pipe()
+        sandbox = Sandbox(timeout, cpus) if settings.sandbox_enabled else None
+        if sandbox is not None:
+            sandbox.open()
+        try:
+            process = subprocess.Popen(
+                child_command([launcher, str(control_read), str(ready_write)], cpus, sandbox),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                stdin=subprocess.PIPE,
+                pass_fds=(control_read, ready_write)
+            )
+            apply_limits(process.pid, cpus, sandbox)
+        except Exception:
+            for fd in (control_read, control_write, ready_read, ready_write):
+                os.close(fd)
+            if sandbox is not None:
+                sandbox.close(None, -1)
+            raise
+        os.close(control_read)
+        os.close(ready_write)
+        return Helper(process, control_write, ready_read, sandbox)
+
+    def take(self, key: tuple):
+        self._check_fork()
+        helpers = self.helpers[key]
+        while helpers:
+            helper = helpers.popleft()
+            if helper.process.poll() is None:
+                return helper
+            helper.discard()
+        return None
+
+    def fill(self, key: tuple):
+        self._check_fork()
+        launcher, cpus, timeout = key
+        with self.lock:
+            helpers = self.helpers[key]
+            while len(helpers) < settings.launcher_pool_size:
+                try:
+                    helpers.append(self.spawn(launcher, list(cpus) if cpus else None, timeout))
+                except OSError:
+                    break
+
+pool = WarmPool()
+
+class Launch:
+    def __init__(self, launcher: str, library: str, cwd: str, name: str, cpus: list, timeout: int):
+        self.key = (launcher, tuple(cpus) if cpus else None, timeout)
+        self.library = os.path.abspath(library)
+        self.cwd = os.path.abspath(cwd)
+        self.name = name
+        self.mode = None
+        self.started = None
+        self.latency_ms = None
+        self.helper = None
+        self.sandbox = None
+
+    def start(self):
+        helper = pool.take(self.key)
+        self.mode = "warm" if helper is not None else "cold"
+        self.started = time.monotonic()
+        if helper is None:
+            launcher, cpus, timeout = self.key
+            helper = pool.spawn(launcher, list(cpus) if cpus else None, timeout)
+        self.helper = helper
+        self.sandbox = helper.sandbox
+
+        request = b"\0".join(part.encode() for part in (self.cwd, self.library, self.name)) + b"\0"
+        try:
+            os.write(helper.control, request)
+        finally:
+            os.close(helper.control)
+        return helper.process
+
+    def refill(self):
+        pool.fill(self.key)
+
+    def finish(self):
+        if self.helper is None:
+            return
+        try:
+            ready = os.read(self.helper.ready, 64)
+        except OSError:
+            ready = b""
+        finally:
+            os.close(self.helper.ready)
+        if ready:
+            self.latency_ms = round((float(ready) - self.started) * 1000, 3)
+
+def prepare(bin_filename: str, link_flags: list, cpus: list, timeout: int):
+    if not settings.launcher_enabled:
+        return None
+    library = shared_library_path(bin_filename)
+    if not os.path.exists(library):
+        return None
+    launcher = build_launcher(link_flags)
+    if launcher is None:
+        return None
+    return Launch(
+        launcher,
+        library,
+        os.path.dirname(bin_filename) or ".",
+        f"./{os.path.basename(bin_filename)}",
+        cpus,
+        timeout
+    )
+
+def supports(flags: list):
+    return settings.launcher_enabled and not any(flag.startswith("-fsanitize") for flag in flags)
+
+def shared_library_path(bin_filename: str):
+    return os.path.splitext(bin_filename)[0] + ".so"
+
+def record(launch: Launch):
+    if launch.mode is None or launch.latency_ms is None:
+        return
+    pipe = redis_client.pipeline()
+    pipe.hincrby(STATS_KEY, f"{launch.mode}_count", 1)
+    pipe.hincrbyfloat(STATS_KEY, f"{launch.mode}_total_ms", launch.latency_ms)
+    pipe.execute()
+
+def get_stats():
+    counters = redis_client.hgetall(STATS_KEY)
+    stats = {}
+    for mode in MODES:
+        count = int(counters.get(f"{mode}_count".encode(), 0))
+        total = float(counters.get(f"{mode}_total_ms".encode(), 0))
+        stats[mode] = {
+            "count": count,
+            "avg_latency_ms": round(total / count, 3) if count else None
+        }
+    cold, warm = stats["cold"]["avg_latency_ms"], stats["warm"]["avg_latency_ms"]
+    stats["speedup"] = round(cold / warm, 2) if cold and warm else None
+    return stats
@@ -0,0 +1,42 @@
+import os
+import sys
+import shutil
+
+from src.config import settings
+from src.dependencies import TASK_QUEUES
+
+def prepare_metrics(queue: str):
+    metrics_dir = os.path.join(os.getcwd(), settings.metrics_multiproc_dir, queue)
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    os.environ.setdefault("OTEL_SERVICE_NAME", f"server_compiler-{queue}")
+
+def start_worker(queue: str):
+    if queue not in TASK_QUEUES:
+        raise SystemExit(f"Неизвестная очередь: {queue}. Доступные: {', '.join(TASK_QUEUES)}")
+    prepare_metrics(queue)
+    from prometheus_client import start_http_server
+    from src.metrics import registry
+    from main import app_celery
+    from src.artifact_store import node_queue
+    start_http_server(settings.worker_metrics_port + TASK_QUEUES.index(queue), registry=registry())
+    hostname = "celery@%h" if queue == "control" else f"{queue}@%h"
+    app_celery.worker_main([
+        "worker",
+        "-Q", f"{queue},{node_queue()},{node_queue(queue=queue)}",
+        "-c", str(settings.queue_concurrency.get(queue, 1)),
+        "-P", settings.queue_pool.get(queue, "prefork"),
+        "-n", hostname,
+        "-l", "info",
+    ])
+
+def start_beat():
+    from main import app_celery
+    app_celery.start(["beat", "-l", "info"])
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "beat":
+        start_beat()
+    else:
+        start_worker(sys.argv[1] if len(sys.argv) > 1 else "compile")